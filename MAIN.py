@@ -1,37 +1,210 @@
 import os
+import re
+import threading
+import time
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine
 from datetime import datetime, timedelta
-from openpyxl import load_workbook
-from openpyxl.worksheet.table import Table, TableStyleInfo
+from openpyxl import Workbook
+from openpyxl.worksheet.filters import AutoFilter
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
 from openpyxl.utils import get_column_letter
+from instrumentation import instrumented, profiled, stage
+from config import REPORTS_DIR
+
+# Days before the event date that count as "seen in medical"
+MEDICAL_WINDOW_DAYS = 182
+
+# Excel's hard limit is 1,048,576 rows per sheet, one of which is the header
+EXCEL_MAX_DATA_ROWS = 1_048_575
+TABLE_STYLE = "TableStyleMedium9"
+
+# --- Excel table names: letters/digits/underscore, unique per workbook ---
+def _table_name(title, used=None):
+    name = re.sub(r"[^A-Za-z0-9_]", "", title) or "Table"
+    if not (name[0].isalpha() or name[0] == "_"):
+        name = f"T{name}"
+    if used is not None:
+        base, n = name, 2
+        while name in used:
+            name, n = f"{base}{n}", n + 1
+        used.add(name)
+    return name
 
 # --- Format sheet as Excel table with autosize ---
 def format_sheet_as_table(sheet, df):
     n_rows, n_cols = df.shape
     last_col = get_column_letter(n_cols)
     table_ref = f"A1:{last_col}{n_rows + 1}"
-    tab = Table(displayName=sheet.title.replace(" ", ""), ref=table_ref)
-    style = TableStyleInfo(name="TableStyleMedium9", showRowStripes=True)
+    tab = Table(displayName=_table_name(sheet.title), ref=table_ref)
+    style = TableStyleInfo(name=TABLE_STYLE, showRowStripes=True)
     tab.tableStyleInfo = style
     sheet.add_table(tab)
     for col in sheet.columns:
         max_length = max(len(str(cell.value)) if cell.value else 0 for cell in col)
         sheet.column_dimensions[col[0].column_letter].width = max(10, min(max_length + 2, 40))
 
-# --- Save DataFrame to Excel with formatting ---
+# --- Column widths from vectorized string lengths (same 10..40 clamp as above) ---
+def _column_widths(df):
+    widths = []
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Measure each category once, then only the ones in use
+            codes = values.cat.codes.to_numpy()
+            lengths = values.cat.categories.astype(str).str.len().to_numpy()[np.unique(codes[codes >= 0])]
+        else:
+            lengths = values.astype(str).str.len().where(values.notna(), 0)
+        max_length = max(len(str(col)), int(lengths.max()) if len(lengths) else 0)
+        widths.append(max(10, min(max_length + 2, 40)))
+    return widths
+
+# --- Split a sheet into Excel-sized parts: "Name", "Name (2)", ... ---
+def _split_for_excel(sheet_name, df, max_rows=EXCEL_MAX_DATA_ROWS):
+    if len(df) <= max_rows:
+        return [(sheet_name, df)]
+    parts = []
+    for i, start in enumerate(range(0, len(df), max_rows), 1):
+        suffix = "" if i == 1 else f" ({i})"
+        parts.append((sheet_name[: 31 - len(suffix)] + suffix, df.iloc[start:start + max_rows]))
+    return parts
+
+# --- Save DataFrame to Excel with formatting (single streaming pass) ---
+@instrumented()
 def export_to_excel_simple(df_dict, output_path):
+    """
+    Write each DataFrame as a styled Excel table in one pass using openpyxl's
+    write-only mode. Widths and the table are set up front, rows are streamed,
+    and sheets over Excel's row limit are split into numbered parts.
+    """
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
-        for sheet_name, df in df_dict.items():
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-    wb = load_workbook(output_path)
-    for sheet_name in df_dict:
-        sheet = wb[sheet_name]
-        format_sheet_as_table(sheet, df_dict[sheet_name])
+    wb = Workbook(write_only=True)
+    used_names = set()
+    for sheet_name, df in df_dict.items():
+        for part_name, part in _split_for_excel(sheet_name, df):
+            ws = wb.create_sheet(title=part_name)
+            n_rows, n_cols = part.shape
+            if n_cols == 0:
+                continue
+            for idx, width in enumerate(_column_widths(part), 1):
+                ws.column_dimensions[get_column_letter(idx)].width = width
+            table_ref = f"A1:{get_column_letter(n_cols)}{max(n_rows, 1) + 1}"
+            tab = Table(
+                displayName=_table_name(part_name, used_names),
+                ref=table_ref,
+                autoFilter=AutoFilter(ref=table_ref),
+                tableColumns=[TableColumn(id=i, name=str(c)) for i, c in enumerate(part.columns, 1)],
+            )
+            tab.tableStyleInfo = TableStyleInfo(name=TABLE_STYLE, showRowStripes=True)
+            with warnings.catch_warnings():
+                # openpyxl always warns in write-only mode; the columns are set above
+                warnings.simplefilter("ignore", UserWarning)
+                ws.add_table(tab)
+            ws.append([str(c) for c in part.columns])
+            values = part.astype(object).where(part.notna(), None)
+            for row in values.itertuples(index=False, name=None):
+                ws.append(row)
     wb.save(output_path)
     print(f"[✓] Excel saved: {output_path}")
 
+# --- Render many workbooks on a process pool ---
+def _export_job(sheets, output_path):
+    """Process-pool worker: one workbook, never raises (the error is reported instead)."""
+    started = time.perf_counter()
+    try:
+        export_to_excel_simple(sheets, output_path)
+        error = None
+    except Exception as e:
+        error = repr(e)
+    return {
+        "path": output_path,
+        "ok": error is None,
+        "error": error,
+        "seconds": round(time.perf_counter() - started, 3),
+        "rows": sum(len(df) for df in sheets.values()),
+    }
+
+
+class WorkbookBatch:
+    """
+    Renders submitted ({sheet: DataFrame}, path) jobs on a process pool, since
+    openpyxl is CPU-bound and single-threaded. A failing job is reported in the
+    summary without stopping the others. At most `max_pending` jobs (and their
+    DataFrames) wait at once; submit() blocks beyond that. A job's `message` is
+    printed once its workbook is actually written.
+    max_workers=1 renders inline with no pool.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.max_workers
+        self.results = []
+        self._pool = None
+        self._pending = {}  # future -> (path, message)
+        self._started = time.perf_counter()
+
+    def submit(self, sheets, output_path, message=None):
+        if self.max_workers == 1:
+            self._finished(_export_job(sheets, output_path), message)
+            return
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        while len(self._pending) >= self.max_pending:
+            self._collect(wait(self._pending, return_when=FIRST_COMPLETED).done)
+        self._pending[self._pool.submit(_export_job, sheets, output_path)] = (output_path, message)
+
+    def _finished(self, result, message):
+        self.results.append(result)
+        if result["ok"] and message:
+            print(message)
+
+    def _collect(self, done):
+        for future in done:
+            path, message = self._pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:  # the worker process itself died
+                result = {"path": path, "ok": False, "error": repr(e), "seconds": None, "rows": None}
+            self._finished(result, message)
+
+    def wait(self):
+        """Finish every job, print a timing summary and return the per-job results."""
+        with stage("workbook_batch", jobs=len(self.results) + len(self._pending)) as rec:
+            self._collect(wait(self._pending).done if self._pending else [])
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+            failed = [r for r in self.results if not r["ok"]]
+            rec["failed"] = len(failed)
+        if self.results:
+            wall = time.perf_counter() - self._started
+            busy = sum(r["seconds"] or 0 for r in self.results)
+            slowest = max(self.results, key=lambda r: r["seconds"] or 0)
+            print(
+                f"[✓] {len(self.results) - len(failed)}/{len(self.results)} workbooks in {wall:.1f}s "
+                f"({busy:.1f}s of rendering; slowest {slowest['seconds']}s: {slowest['path']})"
+            )
+        for r in failed:
+            print(f"❌ Workbook failed: {r['path']}: {r['error']}")
+        return self.results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.wait()
+
+
+def export_workbooks_parallel(jobs, max_workers=None):
+    """Render [(sheets dict, path), ...] on a process pool; returns one result dict per job."""
+    with WorkbookBatch(max_workers) as batch:
+        for sheets, output_path in jobs:
+            batch.submit(sheets, output_path)
+    return batch.results
+
 # --- Prompt user for date input ---
 def prompt_date(prompt_text):
     while True:
@@ -41,120 +214,254 @@ def prompt_date(prompt_text):
         except ValueError:
             print("❌ Invalid format. Please use YYYYMMDD.")
 
+# --- Normalize MRNs to nullable 64-bit integers ---
+def normalize_mrns(mrns):
+    """
+    MRNs as Int64: leading zeros and surrounding whitespace drop out, nulls stay <NA>,
+    and non-numeric values become <NA> (reported) instead of strings like "nan".
+    """
+    if pd.api.types.is_integer_dtype(mrns) or pd.api.types.is_bool_dtype(mrns):
+        return mrns.astype("Int64")
+    if pd.api.types.is_float_dtype(mrns):
+        whole = mrns.where(mrns.notna() & (mrns % 1 == 0))
+    else:
+        text = mrns.astype("string").str.strip()
+        numeric = text.str.fullmatch(r"\d+").fillna(False).astype(bool)
+        whole = pd.to_numeric(text.where(numeric), errors="coerce")
+    bad = int((mrns.notna() & whole.isna()).sum())
+    if bad:
+        print(f"⚠️ {bad} non-numeric MRN value(s) set to null")
+    return whole.astype("Int64")
+
+def mrn_array(mrns):
+    """Sorted, unique int64 array of the non-null MRNs, for intersect1d/setdiff1d."""
+    return np.unique(normalize_mrns(pd.Series(mrns)).dropna().to_numpy(dtype="int64"))
+
 # --- Clean MRNs ---
+@instrumented()
 def clean__df(df):
-    df["MRN"] = df["MRN"].astype(str).str.lstrip("0")
+    if "MRN" in df.columns:
+        df["MRN"] = normalize_mrns(df["MRN"])
+    return df
+
+# --- Dictionary-encode low-cardinality text columns ---
+def to_categoricals(df, columns):
+    """
+    Store `columns` (those present) as categoricals. Categories come out sorted,
+    so sorting on them orders rows exactly as the plain strings would; the
+    Excel/CSV writers decode them back to text.
+    """
+    for col in columns:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
     return df
 
+# --- Database connection (one pooled engine per connection string) ---
+DEFAULT_CONN_STR = (
+    "mssql+pyodbc://@SBNC-sql/NGProd?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes"
+)
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(conn_str=None):
+    """
+    Return the shared engine for `conn_str`, creating it on first use.
+    Falls back to the NGPROD_CONN_STR environment variable, then the hard-coded DSN.
+    """
+    conn_str = conn_str or os.environ.get("NGPROD_CONN_STR") or DEFAULT_CONN_STR
+    with _engines_lock:
+        engine = _engines.get(conn_str)
+        if engine is None:
+            engine = create_engine(conn_str, pool_pre_ping=True)
+            _engines[conn_str] = engine
+    return engine
+
+
+def dispose_engines():
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+# --- Accumulate MRNs from streamed chunks without keeping the chunks ---
+class MRNSetAccumulator:
+    def __init__(self, column="MRN"):
+        self.column = column
+        self.mrns = set()
+
+    def add(self, chunk):
+        self.mrns.update(chunk[self.column].dropna().tolist())
+
+    def result(self):
+        return self.mrns
+
+
+class MRNArrayAccumulator:
+    """Sorted unique int64 MRN array; each chunk is reduced to its unique MRNs on arrival."""
+
+    def __init__(self, column="MRN"):
+        self.column = column
+        self.parts = []
+
+    def add(self, chunk):
+        self.parts.append(mrn_array(chunk[self.column]))
+        if len(self.parts) >= 32:
+            self.parts = [np.unique(np.concatenate(self.parts))]
+
+    def result(self):
+        if not self.parts:
+            return np.array([], dtype="int64")
+        return np.unique(np.concatenate(self.parts))
+
+# --- Stream query results in cleaned chunks ---
+def iter_query_chunks(query, chunksize=50_000, conn_str=None, params=None):
+    engine = get_engine(conn_str)
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql_query(query, con=conn, params=params, chunksize=chunksize):
+            yield clean__df(chunk)
+
 # --- Run SQL query, return cleaned DataFrame ---
-def run_query_and_return(query):
-    conn_str = (
-        "mssql+pyodbc://@SBNC-sql/NGProd?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes"
-    )
+@instrumented()
+def run_query_and_return(query, conn_str=None, chunksize=None, accumulator=None, params=None):
+    """
+    `params` are bound query parameters passed through to pandas.read_sql_query.
+    Without `chunksize`, returns the full cleaned DataFrame.
+    With `chunksize`, streams cleaned chunks into `accumulator` (anything with
+    add(chunk)/result(), default MRNArrayAccumulator) and returns accumulator.result(),
+    or None if the query fails part-way.
+    """
+    if chunksize:
+        if accumulator is None:
+            accumulator = MRNArrayAccumulator()
+        try:
+            for chunk in iter_query_chunks(query, chunksize, conn_str, params):
+                accumulator.add(chunk)
+            return accumulator.result()
+        except Exception as e:
+            print("❌ Failed to stream SQL:", e)
+            return None
     try:
-        engine = create_engine(conn_str)
-        df = pd.read_sql_query(query, con=engine)
+        engine = get_engine(conn_str)
+        df = pd.read_sql_query(query, con=engine, params=params)
         clean__df(df)
         return df
     except Exception as e:
         print("❌ Failed to run SQL:", e)
         return pd.DataFrame()
 
-# --- Main Execution Logic ---
-def run_main_template_query():
-    lower_date = prompt_date("Enter the Date of the Mobile Dental Event")
-    upper_date = datetime.today() - timedelta(days=182)
-
-    lower_str_sql = lower_date.strftime("%Y%m%d")
-    upper_str_sql = upper_date.strftime("%Y%m%d")
-    today_str = datetime.today().strftime('%Y-%m-%d')
+# --- Run independent tasks/queries on a thread pool ---
+def run_tasks_concurrently(tasks, max_workers=None):
+    """
+    Run {name: callable} on a thread pool and return {name: result}.
+    Wall-clock time is roughly that of the slowest task.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers or len(tasks) or 1) as pool:
+        futures = {name: pool.submit(fn) for name, fn in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
 
-    file_date_range1 = lower_date.strftime('%Y-%m-%d')
-    file_date_range2 = f"{upper_date.strftime('%Y-%m-%d')}_to_{today_str}"
 
-    output_file_dental = fr'C:\Reports\Dental Booking Analysis\Dental Booking Analysis {file_date_range1}.xlsx'
-    output_file_medical = fr'C:\Reports\Dental Booking Analysis\Kept Medical Appointments {file_date_range2}.xlsx'
-    comparison_output = fr'C:\Reports\Dental Booking Analysis\MRN_Comparison_{file_date_range1}.xlsx'
+def run_queries_concurrently(queries, conn_str=None, max_workers=None):
+    """Run {name: sql} concurrently through the pooled engine; returns {name: DataFrame}."""
+    return run_tasks_concurrently(
+        {name: (lambda q=query: run_query_and_return(q, conn_str)) for name, query in queries.items()},
+        max_workers=max_workers,
+    )
 
-    # --- Queries ---
-    sql_query_dental = f"""
-    SELECT 
-        x.description AS [Provider Name],
-        m.event AS [Appointment Name], 
-        l.location_name AS [Location Name], 
-        z.appt_date AS [Appointment Date], 
-        z.begintime, 
-        z.appt_kept_ind AS [Kept Status?],
-        z.description AS [Full Patient Name],
-        q.date_of_birth,
-        z.workflow_status, 
-        pp.med_rec_nbr AS [MRN], 
-        z.cancel_ind, 
-        z.delete_ind
-    FROM appointments z
-    INNER JOIN location_mstr l ON l.location_id = z.location_id
-    INNER JOIN provider_mstr x ON x.provider_id = z.rendering_provider_id
-    INNER JOIN events m ON m.event_id = z.event_id
-    INNER JOIN person q ON q.person_id = z.person_id
-    FULL JOIN patient pp ON pp.person_id = q.person_id
-    FULL JOIN patient_encounter pe ON pe.person_id = z.appt_id
-    WHERE 
-        z.appt_date = '{lower_str_sql}' AND 
-        l.location_name LIKE '%Dental%' AND 
-        z.cancel_ind = 'N' 
-    ORDER BY z.appt_date ASC;
-    """
-
-    sql_query_medical_last_12mo = f"""
-    SELECT DISTINCT pp.med_rec_nbr AS [MRN]
-    FROM appointments z
-    INNER JOIN location_mstr l ON l.location_id = z.location_id
-    FULL JOIN patient pp ON pp.person_id = z.person_id
-    WHERE 
-        z.appt_date > '{upper_str_sql}' AND 
-        l.location_name NOT LIKE '%Dental%' AND 
-        z.appt_kept_ind = 'Y'
-    """
-
-    sql_query_medical_all_time = f"""
-    SELECT DISTINCT pp.med_rec_nbr AS [MRN]
-    FROM appointments z
-    INNER JOIN location_mstr l ON l.location_id = z.location_id
-    FULL JOIN patient pp ON pp.person_id = z.person_id
-    WHERE 
-        l.location_name NOT LIKE '%Dental%' AND 
-        z.appt_kept_ind = 'Y'
+# --- Dental vs kept-medical comparison sheets for one event date ---
+def compare_to_medical(df_dental, medical_index, event_date, window_days=MEDICAL_WINDOW_DAYS):
     """
+    {sheet name: rows} for the comparison workbook: dental bookings whose MRN has any
+    kept medical visit, and those whose last one is `window_days` or more before `event_date`.
+    """
+    with stage("mrn_comparison", rows_in=len(df_dental)) as rec:
+        # --- Compare dental MRNs against each patient's last kept medical visit ---
+        dental_mrns = mrn_array(df_dental["MRN"])
+        seen_med_recent = dental_mrns[
+            medical_index.seen_within(dental_mrns, event_date, window_days)
+        ]
+        seen_in_both = np.intersect1d(dental_mrns, medical_index.mrns, assume_unique=True)
+        seen_in_both_not_in_last_12mo = np.setdiff1d(seen_in_both, seen_med_recent, assume_unique=True)
 
-    # --- Run Queries ---
-    df_dental_raw = run_query_and_return(sql_query_dental)
-    print("✅ Retrieved: Dental Schedule")
+        # --- Filter Data ---
+        seen_in_both_df = df_dental[df_dental["MRN"].isin(seen_in_both)].copy()
+        not_seen_med_12mo_df = df_dental[df_dental["MRN"].isin(seen_in_both_not_in_last_12mo)].copy()
+        rec["rows_out"] = len(seen_in_both_df) + len(not_seen_med_12mo_df)
+    return {
+        "Seen in Both": seen_in_both_df,
+        "Seen in Dental, Not Medical 6mo": not_seen_med_12mo_df,
+    }
 
-    df_medical_12mo = run_query_and_return(sql_query_medical_last_12mo)
-    df_medical_all = run_query_and_return(sql_query_medical_all_time)
+# --- Columns pulled for the dental schedule: (SQL expression, output name) ---
+DENTAL_COLUMNS = [
+    ("x.description", "Provider Name"),
+    ("m.event", "Appointment Name"),
+    ("l.location_name", "Location Name"),
+    ("z.appt_date", "Appointment Date"),
+    ("z.begintime", "begintime"),
+    ("z.appt_kept_ind", "Kept Status?"),
+    ("z.description", "Full Patient Name"),
+    ("q.date_of_birth", "date_of_birth"),
+    ("z.workflow_status", "workflow_status"),
+    ("pp.med_rec_nbr", "MRN"),
+    ("z.cancel_ind", "cancel_ind"),
+    ("z.delete_ind", "delete_ind"),
+]
+DENTAL_FILTERS = ["z.cancel_ind = 'N'"]
 
-    # --- Clean and deduplicate MRNs ---
-    dental_mrns = set(df_dental_raw['MRN'].dropna())
-    medical_mrns_12mo = set(df_medical_12mo['MRN'].dropna())
-    medical_mrns_all = set(df_medical_all['MRN'].dropna())
+# --- Main Execution Logic ---
+def run_main_template_query(event_date=None, output_dir=None, medical_index=None):
+    # Pass `medical_index` (a LastVisitIndex) when running several dates, so the
+    # replica is synced and the index built once rather than per date
+    lower_date = event_date or prompt_date("Enter the Date of the Mobile Dental Event")
+    if output_dir is None:
+        output_dir = REPORTS_DIR
+    # Lookback window is measured back from the event date, not from today
+    upper_date = lower_date - timedelta(days=MEDICAL_WINDOW_DAYS)
 
-    seen_in_both = dental_mrns & medical_mrns_all
-    seen_in_both_not_in_last_12mo = seen_in_both - medical_mrns_12mo
+    file_date_range1 = lower_date.strftime('%Y-%m-%d')
+    file_date_range2 = f"{upper_date.strftime('%Y-%m-%d')}_to_{file_date_range1}"
 
-    # --- Filter Data ---
-    seen_in_both_df = df_dental_raw[df_dental_raw["MRN"].isin(seen_in_both)].copy()
-    not_seen_med_12mo_df = df_dental_raw[df_dental_raw["MRN"].isin(seen_in_both_not_in_last_12mo)].copy()
+    output_file_dental = os.path.join(output_dir, f'Dental Booking Analysis {file_date_range1}.xlsx')
+    output_file_medical = os.path.join(output_dir, f'Kept Medical Appointments {file_date_range2}.xlsx')
+    comparison_output = os.path.join(output_dir, f'MRN_Comparison_{file_date_range1}.xlsx')
 
-    # --- Export final MRN comparison workbook ---
-    export_to_excel_simple(
-        {
-            "Seen in Both": seen_in_both_df,
-            "Seen in Dental, Not Medical 6mo": not_seen_med_12mo_df
-        },
-        comparison_output
+    # --- Queries ---
+    from query_builder import build_appointment_query
+    sql_query_dental, dental_params = build_appointment_query(
+        DENTAL_COLUMNS, dates=[lower_date], where=DENTAL_FILTERS
     )
+
+    # --- Run Queries ---
+    # Medical history comes from the local replica; only new rows hit NGProd.
+    # The dental query and the replica sync run side by side.
+    from medical_replica import sync_medical_replica
+    from last_visit_index import LastVisitIndex
+    from query_cache import run_query_cached, ttl_for_dates
+    tasks = {
+        "dental": lambda: run_query_cached(
+            sql_query_dental, params=dental_params, ttl=ttl_for_dates([lower_date])
+        ),
+    }
+    if medical_index is None:
+        tasks["medical_sync"] = sync_medical_replica
+    results = run_tasks_concurrently(tasks)
+    df_dental_raw = results["dental"]
+    print("✅ Retrieved: Dental Schedule")
+    if medical_index is None:
+        with stage("last_visit_index_build") as rec:
+            medical_index = LastVisitIndex.from_replica()
+            rec["rows_out"] = len(medical_index)
+
+    # --- Export final MRN comparison workbook, with the day's rollup summary ---
+    from rollups import daily_summary
+    sheets = compare_to_medical(df_dental_raw, medical_index, lower_date)
+    sheets["Daily Summary"] = daily_summary(lower_date, medical_index)
+    export_to_excel_simple(sheets, comparison_output)
     print(f"[✓] Comparison workbook exported: {comparison_output}")
 
 # --- Run ---
 if __name__ == "__main__":
-    run_main_template_query()
\ No newline at end of file
+    # Set DENTAL_PROFILE=<file.prof> to dump a cProfile of the whole run
+    with profiled(os.environ.get("DENTAL_PROFILE")):
+        run_main_template_query()
\ No newline at end of file
@@ -1,16 +1,30 @@
 
 
 library(tidyverse)
+library(arrow)
 
-X08_12 <- Mobile_Dental_Bookings_2025_08_12 %>%
+# --- Load bookings from the Parquet snapshots written by TEST.py ---
+# Layout: <snapshot_dir>/event_date=YYYY-MM-DD/location=<Location Name>/part-0.parquet
+# DOB and Appointment Date arrive as Date, MRN as integer; no xlsx parsing needed.
+snapshot_dir <- "C:/Reports/Dental Booking Analysis/Snapshots/bookings"
+event_dates  <- c("2025-08-12", "2025-08-14")
+
+Bookings <- open_dataset(snapshot_dir) %>%
+  filter(event_date %in% event_dates) %>%
+  collect()
+
+Goleta <- Bookings %>%
   filter(str_detect(`Location Name`,regex('Goleta|GO'))) %>%
-  distinct(`MRN`,.keep_all = TRUE) %>%
+  distinct(event_date, `MRN`,.keep_all = TRUE)
+
+
+X08_12 <- Goleta %>%
+  filter(event_date == "2025-08-12") %>%
   view()
 
 
-X08_14 <- Mobile_Dental_Bookings_2025_08_14 %>%
-  filter(str_detect(`Location Name`,regex('Goleta|GO'))) %>%
-  distinct(`MRN`,.keep_all = TRUE) %>%
+X08_14 <- Goleta %>%
+  filter(event_date == "2025-08-14") %>%
   view()
 
 
@@ -23,7 +37,6 @@ Bound <- bind_rows(X08_12,X08_14) %>%
 # --- Prepare Base Dataset ---
 SBNC_Outreach_ <- X08_14 %>%
   mutate(
-    DOB  = ymd(DOB),
     Name = str_squish(str_to_upper(`Full Patient Name`))
   ) %>%
   separate(
@@ -1,14 +1,32 @@
 import os
 import re
+import numpy as np
 import pandas as pd
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pyarrow is optional; names fall back to a single regex pass
+    pa = pc = None
 from MAIN import (
-    format_sheet_as_table,
     export_to_excel_simple,
     clean__df,
-    run_query_and_return,
     prompt_date,
+    compare_to_medical,
+    to_categoricals,
+    WorkbookBatch,
+    REPORTS_DIR,
 )
+from query_cache import run_query_cached, ttl_for_dates
+from query_builder import build_appointment_query
+from pipeline import run_pipelined
+from stages import StageGraph
+from snapshots import write_bookings_snapshot
+from outreach_ledger import get_default_ledger
+from sftp_upload import delivered, upload_outreach
+from rollups import daily_summary
+from demographics import get_default_dimension
+from instrumentation import instrumented, profiled
 
 # ---------- Name parsing helper ----------
 def _split_full_name(full_name: str):
@@ -35,16 +53,183 @@ def _split_full_name(full_name: str):
     middle = " ".join(parts[1:-1]) if len(parts) > 2 else None
     return (last or None, first or None, middle or None)
 
-# ---------- Outreach CSV (single file, no location) ----------
+# ---------- Vectorized name parsing ----------
+NAME_COLUMNS = ["Last Name", "First Name", "Middle Name"]
+
+# Every character str.isspace() accepts, spelled out so the regex behaves the
+# same under Python's re and Arrow's RE2
+_WHITESPACE_RUN = "[\t\n\x0b\x0c\r\x1c-\x1f \x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]+"
+
+# Fallback (no pyarrow): one regex pass covering all three shapes
+_NAME_PATTERN = (
+    r"^(?:(?P<c_last>[^,]*?) ?, ?(?P<c_first>[^ ]*)(?: (?P<c_middle>.*))?"  # Last, First Middle
+    r"|(?P<first>[^ ]+)(?: (?P<middle>.+))? (?P<last>[^ ]+)"                # First Middle Last
+    r"|(?P<single>[^ ]+))$"                                                  # single token
+)
+
+def _split_once(arr, sep, reverse=False):
+    """Split on the first (or last) `sep`; rows without it get '' on the far side."""
+    has_sep = pc.match_substring(arr, sep)
+    padded = pc.if_else(has_sep, arr, pc.binary_join_element_wise(arr, "", sep) if not reverse
+                        else pc.binary_join_element_wise("", arr, sep))
+    parts = pc.split_pattern(padded, sep, max_splits=1, reverse=reverse)
+    return pc.list_element(parts, 0), pc.list_element(parts, 1)
+
+def _split_full_names_arrow(name):
+    arr = pa.array(name, type=pa.string(), from_pandas=True)
+    if isinstance(arr, pa.ChunkedArray):
+        # Frames concatenated from several fetches arrive in many small chunks,
+        # and every kernel below pays per-chunk overhead
+        arr = arr.combine_chunks()
+    arr = pc.utf8_trim(pc.replace_substring_regex(arr, _WHITESPACE_RUN, " "), " ")
+    has_comma = pc.match_substring(arr, ",")
+
+    # Format: Last, First Middle
+    c_last, c_rest = _split_once(arr, ",")
+    c_first, c_middle = _split_once(pc.utf8_trim(c_rest, " "), " ")
+
+    # Fallback: First Middle Last (a single token is treated as the last name)
+    head, last = _split_once(arr, " ", reverse=True)
+    first, middle = _split_once(head, " ")
+
+    columns = {
+        "Last Name": pc.if_else(has_comma, pc.utf8_trim(c_last, " "), last),
+        "First Name": pc.if_else(has_comma, c_first, first),
+        "Middle Name": pc.if_else(has_comma, c_middle, middle),
+    }
+    # '' -> null on the Arrow side, then hand pandas plain object arrays (None for null)
+    return {
+        col: pc.if_else(pc.equal(values, ""), pa.scalar(None, pa.string()), values).to_numpy(zero_copy_only=False)
+        for col, values in columns.items()
+    }
+
+def _split_full_names_regex(name):
+    name = name.astype(object).str.replace(_WHITESPACE_RUN, " ", regex=True).str.strip(" ")
+    parts = name.str.extract(_NAME_PATTERN)
+    columns = {
+        "Last Name": parts["c_last"].fillna(parts["last"]).fillna(parts["single"]),
+        "First Name": parts["c_first"].fillna(parts["first"]),
+        "Middle Name": parts["c_middle"].fillna(parts["middle"]),
+    }
+    return {
+        col: values.astype(object).where(values.notna() & values.ne(""), None).to_numpy()
+        for col, values in columns.items()
+    }
+
+def split_full_names(names: pd.Series) -> pd.DataFrame:
+    """
+    Vectorized `_split_full_name` over a whole column.
+    Returns a DataFrame with 'Last Name', 'First Name', 'Middle Name'
+    (None where missing), aligned to `names.index`.
+    """
+    is_str = names.map(type).eq(str) if names.dtype == object else names.notna()
+    name = names.where(is_str)
+    if pc is not None:
+        columns = _split_full_names_arrow(name)
+    else:
+        columns = _split_full_names_regex(name)
+    return pd.DataFrame(columns, index=names.index, dtype=object)
+
+# ---------- Location recode ----------
+# Raw `Location Name` -> canonical clinic (same table as SFTP_FIle_Prep.r);
+# names not listed are their own clinic
+LOCATION_RECODE = {
+    "Eastside - ICC Dental": "Eastside Family Dental Clinic",
+    "Eastside Family Dental - Outreach": "Eastside Family Dental Clinic",
+    "GO Neighborhood Dental Clinic OLD": "Goleta Neighborhood Dental Clinic",
+    "Goleta Smile Van": "Goleta Neighborhood Dental Clinic",
+    "Z Eastside Family Dental Clinic": "Eastside Family Dental Clinic",
+}
+
+def _clinic_slug(clinic: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", clinic).strip("_") or "Unassigned"
+
+# ---------- Phone normalization ----------
+PHONE_FORMATS = (None, "digits", "e164")
+_BLANK_STRINGS = ["", "None", "nan", "<NA>"]
+
+def normalize_phones(phones: pd.Series, phone_format: str | None = "e164") -> tuple[pd.Series, pd.Series]:
+    """
+    One vectorized pass over US phone numbers.
+    Returns (normalized, valid): 10 digits, or 11 starting with 1, are valid;
+    "digits" gives the 10-digit number, "e164" gives +1XXXXXXXXXX, None leaves the text as is.
+    """
+    digits = phones.astype("string").str.replace(r"\D+", "", regex=True)
+    digits = digits.where(~((digits.str.len() == 11) & digits.str.startswith("1")), digits.str.slice(1))
+    valid = (digits.str.len() == 10).fillna(False).astype(bool)
+    if phone_format == "digits":
+        return digits, valid
+    if phone_format == "e164":
+        return "+1" + digits, valid
+    return phones, valid
+
+# ---------- Outreach CSV (single file, or one per clinic) ----------
+OUTREACH_COLUMNS = [
+    "personLastName", "personMidName", "personFirstName", "personCellPhone",
+    "personHomePhone", "personWorkPhone", "personPrefLanguage", "dob", "gender",
+    "personID", "PersonEmail",
+]
+
+def _text_or_blank(values: pd.Series) -> pd.Series:
+    """Stripped text with null/'None'/'nan' as ''; a no-op on columns the caller already cleaned."""
+    values = values.astype("string").str.strip()
+    return values.where(~values.isin(_BLANK_STRINGS), "").fillna("")
+
+def _contains(values: pd.Series, text: str) -> np.ndarray:
+    """Case-insensitive match mask; on a categorical the match runs once per category."""
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        return values.str.contains(text, case=False, na=False).to_numpy(dtype=bool)
+    hits = np.asarray(values.cat.categories.str.contains(text, case=False), dtype=bool)
+    return np.append(hits, False)[values.cat.codes.to_numpy()]  # code -1 (missing) -> False
+
+def _recode(values: pd.Series, mapping: dict, fill=None) -> pd.Series:
+    """
+    values.replace(mapping), then missing -> `fill`. On a categorical the mapping
+    runs once per category and the result stays categorical.
+    """
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.replace(mapping)
+        return values if fill is None else values.fillna(fill)
+    mapped = pd.Series(values.cat.categories, dtype=object).replace(mapping)
+    extra = [] if fill is None else [fill]
+    categories = pd.Index(pd.unique(pd.concat([mapped.dropna(), pd.Series(extra, dtype=object)]))).sort_values()
+    fill_code = categories.get_loc(fill) if fill is not None else -1
+    lookup = categories.get_indexer(mapped)
+    lookup[lookup < 0] = fill_code
+    codes = np.append(lookup, fill_code)[values.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories), index=values.index, name=values.name)
+
+@instrumented()
 def generate_outreach_file(
     df: pd.DataFrame,
     output_dir: str,
     campaign_name: str = "Mobile_Dental_Outreach",
     current_date_str: str | None = None,
     digits_only_phone: bool = False,
+    location_recode: dict | None = None,
+    location_contains: str | None = None,
+    phone_format: str | None = None,
+    ledger=None,
+    ledger_campaign: str | None = None,
+    run_stamp: str | None = None,
 ):
     """
-    Convert cleaned query results to a single outreach CSV.
+    Convert cleaned query results to outreach CSVs.
+    Without `location_recode`, writes a single CSV and returns its path.
+    With `location_recode` ({raw Location Name: clinic}), writes one CSV per
+    canonical clinic via a single groupby; returns {clinic: path}.
+    `location_contains` keeps only rows whose raw Location Name contains that text.
+    Rows with a blank cell phone are dropped and personID is deduped (per clinic)
+    before any output column is built, so only surviving rows are copied.
+    `phone_format`: None (as entered), "digits" or "e164" (`digits_only_phone=True`
+    means "digits"). With a format, numbers that aren't valid US numbers go to
+    {campaign}_{date}_rejected_phones.csv instead of the outreach file.
+    `ledger` (an OutreachLedger) turns on delta mode: personIDs already sent for
+    `ledger_campaign` (default `campaign_name`) are dropped, and the ones written are
+    recorded as pending on their file until ledger.mark_sent(). Delta files carry
+    `run_stamp` (default: now, YYYYMMDD-HHMMSS) in their name, so a second delta run
+    for the same date never overwrites a file that may not have gone out yet; calls
+    sharing a `run_stamp` never write the same patient twice.
     Output columns:
       personLastName, personMidName, personFirstName, personCellPhone,
       personHomePhone, personWorkPhone, personPrefLanguage, dob, gender,
@@ -53,144 +238,228 @@ def generate_outreach_file(
     if df is None or df.empty:
         print("⚠️ No data to create outreach file.")
         return None
-
-    df = df.copy()
-
-    # Recode Language
-    if "Language" in df.columns:
-        df["Language"] = df["Language"].replace({"Spanish; Castilian": "Spanish"})
-
-    # Split names from "Full Patient Name" if needed
-    if "Full Patient Name" in df.columns:
-        split_names = df["Full Patient Name"].apply(_split_full_name)
-        df["Last Name"] = split_names.apply(lambda t: t[0])
-        df["First Name"] = split_names.apply(lambda t: t[1])
-        df["Middle Name"] = split_names.apply(lambda t: t[2])
-    else:
+    if digits_only_phone and phone_format is None:
+        phone_format = "digits"
+    if phone_format not in PHONE_FORMATS:
+        raise ValueError(f"phone_format must be one of {PHONE_FORMATS}, got {phone_format!r}")
+    if "Full Patient Name" not in df.columns:
         missing = [c for c in ["First Name", "Last Name"] if c not in df.columns]
         if missing:
             raise KeyError(
                 f"Missing name columns: {missing} and no 'Full Patient Name' to derive them."
             )
 
-    # Format DOB as YYYYMMDD
-    if "DOB" in df.columns:
-        dob_series = pd.to_datetime(df["DOB"], errors="coerce")
-        df["dob_fmt"] = dob_series.dt.strftime("%Y%m%d")
-    else:
-        df["dob_fmt"] = None
+    # --- Row selection first: location filter, non-blank phone, one row per personID ---
+    # Positions rather than labels, so a frame concatenated from several fetches
+    # (repeated index labels) is handled the same way
+    pos = np.arange(len(df))
+    if location_contains and "Location Name" in df.columns:
+        pos = pos[_contains(df["Location Name"], location_contains)]
+        if not len(pos):
+            print("⚠️ No records found.")
+            return None
 
-    # Clean phone/email strings
-    for col in ["Phone Number", "Email"]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().replace({"None": "", "nan": ""})
+    def take(name):
+        return df[name].iloc[pos].reset_index(drop=True) if name in df.columns else None
 
-    # Outreach frame
+    phones = take("Phone Number")
+    phones = _text_or_blank(phones) if phones is not None else pd.Series("", index=range(len(pos)), dtype="string")
+    has_phone = phones.ne("").to_numpy()
+    pos, phones = pos[has_phone], phones[has_phone].reset_index(drop=True)
+
+    clinic = None
+    if location_recode is not None:
+        locations = take("Location Name")
+        if locations is None:
+            locations = pd.Series(None, index=range(len(pos)), dtype=object)
+        clinic = _recode(locations, location_recode, fill="Unassigned")
+    if "MRN" in df.columns:
+        key = pd.DataFrame({"personID": take("MRN")})
+        if clinic is not None:
+            key["clinic"] = clinic
+        first = ~key.duplicated().to_numpy()
+        pos, phones = pos[first], phones[first].reset_index(drop=True)
+        if clinic is not None:
+            clinic = clinic[first].reset_index(drop=True)
+
+    # --- Delta mode: anti-join against the campaign's ledger in one step ---
+    # Patients already written earlier in this run (another date of the batch) are
+    # skipped too, even though their file is still pending upload
+    ledger_campaign = ledger_campaign or campaign_name
+    if ledger is not None:
+        run_stamp = run_stamp or datetime.now().strftime("%Y%m%d-%H%M%S")
+    if ledger is not None and "MRN" in df.columns:
+        new = ledger.is_new(ledger_campaign, take("MRN"), run=run_stamp)
+        if not new.all():
+            print(f"↩️ {int((~new).sum())} patient(s) already sent for {ledger_campaign}; writing only new ones")
+            pos, phones = pos[new], phones[new].reset_index(drop=True)
+            if clinic is not None:
+                clinic = clinic[new].reset_index(drop=True)
+        if not len(pos):
+            print("⚠️ No new patients to send.")
+            return None
+
+    # --- Phone normalization (one vectorized pass) and rejects ---
+    rejected = None
+    if phone_format is not None:
+        normalized, valid = normalize_phones(phones, phone_format)
+        valid = valid.to_numpy()
+        if not valid.all():
+            rejected = pd.DataFrame(
+                {
+                    "personID": take("MRN")[~valid] if "MRN" in df.columns else None,
+                    "personCellPhone": phones[~valid],
+                    "reason": "not a 10-digit US number",
+                }
+            )
+            pos = pos[valid]
+            if clinic is not None:
+                clinic = clinic[valid].reset_index(drop=True)
+        phones = normalized[valid].reset_index(drop=True)
+
+    # --- Build only the 11 output columns, for surviving rows ---
+    if "Full Patient Name" in df.columns:
+        names = split_full_names(take("Full Patient Name"))
+    else:
+        names = pd.DataFrame({c: take(c) for c in NAME_COLUMNS})
+    dob = take("DOB")
+    email = take("Email")
     cleaned = pd.DataFrame(
         {
-            "personLastName": df.get("Last Name"),
-            "personMidName": df.get("Middle Name"),
-            "personFirstName": df.get("First Name"),
-            "personCellPhone": df.get("Phone Number"),
+            "personLastName": names["Last Name"],
+            "personMidName": names.get("Middle Name"),
+            "personFirstName": names["First Name"],
+            "personCellPhone": phones,
             "personHomePhone": None,
             "personWorkPhone": None,
-            "personPrefLanguage": df.get("Language"),
-            "dob": df.get("dob_fmt"),
-            "gender": df.get("Sex at Birth"),
-            "personID": df.get("MRN"),
-            "PersonEmail": df.get("Email"),
-        }
+            "personPrefLanguage": take("Language"),  # recoded once by the demographics dimension
+            "dob": None if dob is None else pd.to_datetime(dob, errors="coerce").dt.strftime("%Y%m%d"),
+            "gender": take("Sex at Birth"),
+            "personID": take("MRN"),
+            "PersonEmail": None if email is None else _text_or_blank(email),
+        },
+        index=range(len(pos)),
+        columns=OUTREACH_COLUMNS,
     )
 
-    # Remove duplicate personIDs (keeping the first occurrence)
-    if "personID" in cleaned.columns:
-        cleaned = cleaned.drop_duplicates(subset=["personID"])
+    # Output file path
+    if current_date_str is None:
+        current_date_str = date.today().strftime("%Y-%m-%d")
+    suffix = current_date_str
+    if ledger is not None:
+        suffix += "_" + run_stamp
 
-    # Optional: keep only digits in phone
-    if digits_only_phone and "personCellPhone" in cleaned.columns:
-        cleaned["personCellPhone"] = cleaned["personCellPhone"].astype(str).str.replace(
-            r"\D+", "", regex=True
+    os.makedirs(output_dir, exist_ok=True)
+    if rejected is not None:
+        reject_path = os.path.join(output_dir, f"{campaign_name}_{suffix}_rejected_phones.csv")
+        rejected.to_csv(reject_path, index=False)
+        print(f"⚠️ {len(rejected)} invalid phone number(s) written to {reject_path}")
+
+    if location_recode is None:
+        out_path = os.path.join(output_dir, f"{campaign_name}_{suffix}.csv")
+        cleaned.to_csv(out_path, index=False)
+        print(f"📤 Outreach file written: {out_path}")
+        if ledger is not None:
+            ledger.record(
+                ledger_campaign, cleaned["personID"], event_date=current_date_str, file=os.path.basename(out_path),
+                run=run_stamp,
+            )
+        return out_path
+
+    # One CSV per canonical clinic
+    out_paths = {}
+    for clinic_name, clinic_df in cleaned.groupby(clinic, sort=True):
+        out_path = os.path.join(
+            output_dir, f"{campaign_name}_{_clinic_slug(clinic_name)}_{suffix}.csv"
         )
+        clinic_df.to_csv(out_path, index=False)
+        print(f"📤 Outreach file written: {out_path}")
+        out_paths[clinic_name] = out_path
+        if ledger is not None:
+            ledger.record(
+                ledger_campaign, clinic_df["personID"], event_date=current_date_str, file=os.path.basename(out_path),
+                run=run_stamp,
+            )
+    return out_paths
+
+# ---------- Columns pulled for bookings exports: (SQL expression, output name) ----------
+BOOKING_COLUMNS = [
+    ("x.description", "Provider Name"),
+    ("m.event", "Appointment Name"),
+    ("l.location_name", "Location Name"),
+    ("z.appt_date", "Appointment Date"),
+    ("z.begintime", "begintime"),
+    ("z.appt_kept_ind", "Kept Status?"),
+    ("z.description", "Full Patient Name"),
+    ("CAST(pp.med_rec_nbr AS INT)", "MRN"),
+    ("z.workflow_status", "workflow_status"),
+    ("z.cancel_ind", "cancel_ind"),
+    ("z.delete_ind", "delete_ind"),
+    ("z.person_id", "person_id"),
+]
+BOOKING_FILTERS = ["z.cancel_ind = 'N'"]
+# DOB, phone, email, language and sex come from the local demographics dimension
+# (see demographics.py) rather than a person join; this is the merged column order
+BOOKING_OUTPUT_COLUMNS = [
+    "Provider Name", "Appointment Name", "Location Name", "Appointment Date", "begintime",
+    "Kept Status?", "Full Patient Name", "MRN", "DOB", "Phone Number", "Email", "Language",
+    "Sex at Birth", "workflow_status", "cancel_ind", "delete_ind",
+]
+
+# A few dozen distinct values each: held as categoricals from the query on, so
+# sorting, grouping and location matching work on codes rather than row strings
+BOOKING_CATEGORICALS = [
+    "Provider Name", "Location Name", "Appointment Name", "Kept Status?", "Language",
+    "Sex at Birth", "workflow_status", "cancel_ind", "delete_ind",
+]
+
+# Outreach for the Goleta-only variant (the Expected Dental Appointment Export)
+GOLETA_OUTREACH_LOCATION = "Goleta Dental"
 
-    # Drop rows with missing/blank cell phone
-    cleaned["personCellPhone"] = (
-        cleaned["personCellPhone"].fillna("").astype(str).str.strip()
+# Event dates per bookings query: a week of events is one round trip, and a long
+# range still arrives in month-sized frames rather than one that holds it all
+DATES_PER_FETCH = 31
+
+# ---------- Stage graph: query -> enrich -> clean -> normalize -> exports/variants ----------
+# Every variant reads the same memoized "normalize" result, so asking for several
+# outputs in one run costs one query and one cleaning pass per batch of dates.
+BOOKINGS_GRAPH = StageGraph("bookings")
+
+@BOOKINGS_GRAPH.stage("query", params=("dates", "refresh_cache"))
+def _query_bookings(dates, refresh_cache):
+    sql_query_dental, query_params = build_appointment_query(
+        BOOKING_COLUMNS, dates=dates, where=BOOKING_FILTERS
     )
-    cleaned = cleaned.loc[cleaned["personCellPhone"] != ""].copy()
+    df_raw = run_query_cached(
+        sql_query_dental, params=query_params, ttl=ttl_for_dates(dates), refresh=bool(refresh_cache)
+    )
+    return None if df_raw is None or df_raw.empty else df_raw
 
-    # Output file path
-    if current_date_str is None:
-        current_date_str = date.today().strftime("%Y-%m-%d")
+@BOOKINGS_GRAPH.stage("demographics")
+def _demographics():
+    """Once per run: pick up person rows changed in NGProd since the last run."""
+    dimension = get_default_dimension()
+    dimension.refresh_changed()
+    return dimension
 
-    os.makedirs(output_dir, exist_ok=True)
-    out_path = os.path.join(output_dir, f"{campaign_name}_{current_date_str}.csv")
-    cleaned.to_csv(out_path, index=False)
-    print(f"📤 Outreach file written: {out_path}")
-    return out_path
-# ---------- Main query function ----------
-def run_main_template_query(
-    output_dir: str | None = None,
-    outreach_dir: str | None = None,
-    sheet_name: str = "Dental Bookings",
-):
-    """
-    Prompts for a Mobile Dental event date, queries bookings for that exact date,
-    cleans the result, exports Excel to `output_dir`, and writes a single outreach
-    CSV to `outreach_dir`.
-    Returns the cleaned DataFrame.
-    """
-    # --- Get date from user ---
-    event_dt = prompt_date("Enter the Date of the Mobile Dental Event")  # datetime.date
-    event_str_sql = event_dt.strftime("%Y%m%d")     # For SQL format
-    event_str_file = event_dt.strftime("%Y-%m-%d")  # For file naming
+@BOOKINGS_GRAPH.stage("enrich", inputs=("query", "demographics"))
+def _enrich_bookings(query, demographics):
+    """Merge the cleaned demographic fields onto the appointment rows by person_id."""
+    if query is None:
+        return None
+    df = demographics.enrich(query)[BOOKING_OUTPUT_COLUMNS]
+    return to_categoricals(df, BOOKING_CATEGORICALS)
 
-    # --- Default directories ---
-    if output_dir is None:
-        output_dir = r"C:\Reports\Dental Booking Analysis"
-    if outreach_dir is None:
-        outreach_dir = os.path.join(output_dir, "Outreach")  # separate folder
+@BOOKINGS_GRAPH.stage("clean", inputs=("enrich",))
+def _clean_bookings(enrich):
+    return None if enrich is None else clean__df(enrich)
 
-    # --- SQL Query ---
-    sql_query_dental = f"""
-        SELECT 
-            x.description AS [Provider Name],
-            m.event AS [Appointment Name], 
-            l.location_name AS [Location Name], 
-            z.appt_date AS [Appointment Date], 
-            z.begintime, 
-            z.appt_kept_ind AS [Kept Status?],
-            z.description AS [Full Patient Name],
-            CAST(pp.med_rec_nbr AS INT) AS [MRN], 
-            CAST(q.date_of_birth AS DATE) AS [DOB],
-            q.cell_phone AS [Phone Number], 
-            q.email_address AS [Email],    
-            q.language AS [Language], 
-            q.sex AS [Sex at Birth], 
-            z.workflow_status, 
-            z.cancel_ind, 
-            z.delete_ind
-        FROM appointments z
-        INNER JOIN location_mstr l ON l.location_id = z.location_id
-        INNER JOIN provider_mstr x ON x.provider_id = z.rendering_provider_id
-        INNER JOIN events m ON m.event_id = z.event_id
-        INNER JOIN person q ON q.person_id = z.person_id
-        FULL JOIN patient pp ON pp.person_id = q.person_id
-        FULL JOIN patient_encounter pe ON pe.person_id = z.appt_id
-        WHERE 
-            z.appt_date = '{event_str_sql}' AND 
-            l.location_name LIKE '%Dental%' AND 
-            z.cancel_ind = 'N' 
-        ORDER BY z.appt_date ASC;
-    """
-
-    # --- Run Query ---
-    df_raw = run_query_and_return(sql_query_dental)
-    if df_raw is None or df_raw.empty:
-        print(f"⚠️ No dental bookings found for {event_str_file}.")
-        return df_raw
-
-    # --- Clean Data ---
-    df = clean__df(df_raw).copy()
+@BOOKINGS_GRAPH.stage("normalize", inputs=("clean",))
+def _normalize_bookings(clean):
+    """Date/time/phone normalization and sort on a cleaned bookings frame."""
+    if clean is None:
+        return None
+    df = clean.copy()
 
     # Convert date columns
     for col in ["Appointment Date", "DOB"]:
@@ -201,10 +470,11 @@ def run_main_template_query(
     if "begintime" in df.columns and "Begin Time" not in df.columns:
         df.rename(columns={"begintime": "Begin Time"}, inplace=True)
 
-    # Strip strings
+    # Phone Number/Email arrive stripped from the demographics dimension with nulls kept;
+    # blank-fill them here as the exports always have (people missing from the dimension too)
     for col in ["Phone Number", "Email"]:
         if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().replace({"None": "", "nan": ""})
+            df[col] = df[col].astype(object).fillna("")
 
     # Sort data (only using columns that exist)
     sort_cols = [
@@ -214,32 +484,281 @@ def run_main_template_query(
     ]
     if sort_cols:
         df = df.sort_values(sort_cols)
+    return df
+
+def _by_event_date(df):
+    """(YYYY-MM-DD, rows) per appointment date."""
+    if df is None:
+        return []
+    return [(day.strftime("%Y-%m-%d"), df_day) for day, df_day in df.groupby("Appointment Date", sort=True)]
+
+def _export_workbook(sheets, path, workbook_batch=None, message=None):
+    """
+    Hand the workbook to the run's process pool when there is one, else write it now.
+    `message` is printed once the workbook is written (failures go to the batch summary).
+    """
+    if workbook_batch is None:
+        export_to_excel_simple(sheets, path)
+        if message:
+            print(message)
+    else:
+        workbook_batch.submit(sheets, path, message=message)
+
+@BOOKINGS_GRAPH.stage("workbooks", inputs=("normalize",), params=("output_dir", "sheet_name", "workbook_batch"))
+def _write_workbooks(normalize, output_dir, sheet_name, workbook_batch):
+    """One bookings workbook per event date; returns {date: path}."""
+    paths = {}
+    for event_str_file, df_day in _by_event_date(normalize):
+        out_path_xlsx = os.path.join(output_dir, f"Mobile_Dental_Bookings_{event_str_file}.xlsx")
+        _export_workbook(
+            {sheet_name: df_day}, out_path_xlsx, workbook_batch,
+            message=f"✅ Retrieved Dental bookings for {event_str_file} → {out_path_xlsx}",
+        )
+        paths[event_str_file] = out_path_xlsx
+    return paths
+
+@BOOKINGS_GRAPH.stage("snapshots", inputs=("normalize",), params=("snapshot_dir",))
+def _write_snapshots(normalize, snapshot_dir):
+    """Typed Parquet partitions (event date / location) for SFTP_FIle_Prep.r."""
+    return write_bookings_snapshot(normalize, snapshot_dir)
+
+def _write_outreach(df, outreach_dir, delta_outreach=False, run_stamp=None, **outreach_options):
+    """Outreach CSV(s) per event date; a failure skips that date's file only."""
+    paths = {}
+    ledger = get_default_ledger() if delta_outreach else None
+    for event_str_file, df_day in _by_event_date(df):
+        try:
+            paths[event_str_file] = generate_outreach_file(
+                df=df_day,
+                output_dir=outreach_dir,              # <— separate folder
+                campaign_name="Mobile_Dental_Event",
+                current_date_str=event_str_file,
+                ledger=ledger,
+                run_stamp=run_stamp,
+                **outreach_options,
+            )
+        except Exception as e:
+            print(f"⚠️ Outreach file generation skipped due to error: {e}")
+            paths[event_str_file] = None
+    return paths
+
+@BOOKINGS_GRAPH.stage("outreach_all_clinics", inputs=("normalize",), params=("outreach_dir", "delta_outreach", "run_stamp"))
+def _outreach_all_clinics(normalize, outreach_dir, delta_outreach, run_stamp):
+    # one CSV per canonical clinic
+    return _write_outreach(
+        normalize, outreach_dir, delta_outreach, run_stamp, location_recode=LOCATION_RECODE,
+        ledger_campaign="Mobile_Dental_Event:all-clinics",
+    )
+
+@BOOKINGS_GRAPH.stage("outreach_goleta", inputs=("normalize",), params=("outreach_dir", "delta_outreach", "run_stamp"))
+def _outreach_goleta(normalize, outreach_dir, delta_outreach, run_stamp):
+    return _write_outreach(
+        normalize, outreach_dir, delta_outreach, run_stamp, location_contains=GOLETA_OUTREACH_LOCATION,
+        ledger_campaign="Mobile_Dental_Event:goleta",
+    )
+
+@BOOKINGS_GRAPH.stage("medical_index")
+def _medical_index():
+    from medical_replica import sync_medical_replica
+    from last_visit_index import LastVisitIndex
+    sync_medical_replica()
+    return LastVisitIndex.from_replica()
+
+@BOOKINGS_GRAPH.stage("comparison", inputs=("normalize", "medical_index"), params=("output_dir", "workbook_batch"))
+def _comparison(normalize, medical_index, output_dir, workbook_batch):
+    """MRN comparison workbook per event date, from the already-fetched bookings, plus its rollup summary."""
+    paths = {}
+    for event_str_file, df_day in _by_event_date(normalize):
+        event_date = datetime.strptime(event_str_file, "%Y-%m-%d")
+        out_path = os.path.join(output_dir, f"MRN_Comparison_{event_str_file}.xlsx")
+        sheets = compare_to_medical(df_day, medical_index, event_date)
+        sheets["Daily Summary"] = daily_summary(event_date, medical_index)
+        _export_workbook(sheets, out_path, workbook_batch, message=f"[✓] Comparison workbook: {out_path}")
+        paths[event_str_file] = out_path
+    return paths
 
-    # --- Export Excel (to output_dir) ---
+# Output variants selectable per run (the bookings workbook is always written)
+VARIANTS = {
+    "all-clinics": "outreach_all_clinics",
+    "goleta": "outreach_goleta",
+    "comparison": "comparison",
+}
+
+def _outreach_paths(outputs):
+    """Flatten {date: path | {clinic: path} | None} from the outreach stages into a list of paths."""
+    paths = []
+    for written in outputs.values():
+        if isinstance(written, dict):
+            paths.extend(p for p in written.values() if p)
+        elif written:
+            paths.append(written)
+    return paths
+
+def _concat_bookings(frames):
+    """pd.concat that keeps the categorical columns categorical (categories unioned, still sorted)."""
+    for col in BOOKING_CATEGORICALS:
+        if len(frames) > 1 and all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames if col in f.columns):
+            categories = pd.Index([])
+            for f in frames:
+                categories = categories.union(f[col].cat.categories) if col in f.columns else categories
+            frames = [f.assign(**{col: f[col].cat.set_categories(categories)}) if col in f.columns else f for f in frames]
+    return pd.concat(frames)
+
+def fetch_bookings(dates: list, refresh_cache: bool = False) -> pd.DataFrame | None:
+    """One query for `dates` (through the query cache), cleaned and sorted; None if nothing came back."""
+    return BOOKINGS_GRAPH.run("normalize", dates=list(dates), refresh_cache=refresh_cache)
+
+# ---------- What an export writes besides the workbooks ----------
+class ExportOptions:
+    """
+    Variant, outreach and upload settings for run_main_template_query.
+    `variants`: outputs built from the shared query ("all-clinics", "goleta", "comparison").
+    `outreach_dir`: where outreach CSVs go (default <output_dir>/Outreach).
+    `delta_outreach`: skip patients already sent in the campaign (see outreach_ledger).
+    `upload`: send the outreach CSVs to the vendor SFTP drop, gzipped with `compress_upload`.
+    """
+
+    def __init__(
+        self,
+        variants: tuple = ("all-clinics",),
+        outreach_dir: str | None = None,
+        delta_outreach: bool = False,
+        upload: bool = False,
+        compress_upload: bool = False,
+    ):
+        unknown = [v for v in variants if v not in VARIANTS]
+        if unknown:
+            raise ValueError(f"Unknown variant(s) {unknown}; choose from {sorted(VARIANTS)}")
+        self.variants = tuple(variants)
+        self.outreach_dir = outreach_dir
+        self.delta_outreach = delta_outreach
+        self.upload = upload
+        self.compress_upload = compress_upload
+
+# ---------- Main query function ----------
+def run_main_template_query(
+    output_dir: str | None = None,
+    sheet_name: str = "Dental Bookings",
+    event_dates: list | None = None,
+    date_range: tuple | None = None,
+    refresh_cache: bool = False,
+    options: ExportOptions | None = None,
+    dates_per_fetch: int = DATES_PER_FETCH,
+    max_in_flight: int = 2,
+    snapshot_dir: str | None = None,
+    write_snapshots: bool = True,
+    workbook_workers: int | None = None,
+    return_bookings: bool = True,
+):
+    """
+    Queries Mobile Dental bookings and writes one Excel workbook to `output_dir`
+    per event date, plus each variant in `options` (an ExportOptions; default: the
+    "all-clinics" outreach CSV per clinic): "all-clinics", "goleta" (Goleta Dental
+    outreach CSV) and "comparison" (MRN comparison workbook). All variants share
+    one query and cleaning pass.
+    Dates come from `event_dates` (list), `date_range` (inclusive (start, end)),
+    or a prompt for a single date when neither is given.
+    Dates are fetched `dates_per_fetch` at a time on a background thread while the
+    previous batch's files are written; at most `max_in_flight` fetched batches wait
+    in memory.
+    Results for settled past dates are served from the local query cache;
+    `refresh_cache=True` re-queries NGProd and overwrites the cached copy.
+    With `write_snapshots`, each date is also written as Parquet partitions under
+    `snapshot_dir` (default <output_dir>/Snapshots/bookings) for the R prep script.
+    With `options.delta_outreach`, outreach files skip patients already sent in
+    that campaign (see outreach_ledger) and record the ones they include; with
+    `options.upload` those only count as sent once their file is uploaded.
+    Workbooks render on a pool of `workbook_workers` processes (default: one per
+    CPU, or inline for a single date); a workbook that fails is reported in the
+    closing summary without stopping the others.
+    With `options.upload`, each batch's outreach CSVs go to the vendor SFTP drop
+    configured by OUTREACH_SFTP_* (see sftp_upload).
+    Returns the cleaned DataFrame for all dates. Scheduled runs that don't use it
+    pass `return_bookings=False`: each batch is then dropped once its files are
+    written, and the number of bookings written is returned instead.
+    """
+    options = options or ExportOptions()
+
+    # --- Get date(s) ---
+    if event_dates is None and date_range is None:
+        event_dates = [prompt_date("Enter the Date of the Mobile Dental Event")]
+
+    if date_range is not None:
+        start_dt, end_dt = (d.date() if isinstance(d, datetime) else d for d in date_range)
+        dates = [start_dt + timedelta(days=i) for i in range((end_dt - start_dt).days + 1)]
+        label = f"{start_dt.strftime('%Y-%m-%d')} to {end_dt.strftime('%Y-%m-%d')}"
+    else:
+        dates = sorted({d.date() if isinstance(d, datetime) else d for d in event_dates})
+        label = ", ".join(d.strftime("%Y-%m-%d") for d in dates)
+
+    # --- Default directories ---
+    if output_dir is None:
+        output_dir = REPORTS_DIR
+    outreach_dir = options.outreach_dir
+    if outreach_dir is None:
+        outreach_dir = os.path.join(output_dir, "Outreach")  # separate folder
+    if snapshot_dir is None:
+        snapshot_dir = os.path.join(output_dir, "Snapshots", "bookings")
     os.makedirs(output_dir, exist_ok=True)
-    out_path_xlsx = os.path.join(output_dir, f"Mobile_Dental_Bookings_{event_str_file}.xlsx")
-    try:
-        export_to_excel_simple({sheet_name: df}, out_path_xlsx)
-    except TypeError:
-        export_to_excel_simple(df, out_path_xlsx, sheet_name=sheet_name)
-
-    print(f"✅ Retrieved & exported Dental bookings for {event_str_file} → {out_path_xlsx}")
-
-    # --- Outreach CSV (to outreach_dir) ---
-    try:
-        out_csv = generate_outreach_file(
-            df=df,
-            output_dir=outreach_dir,              # <— separate folder
-            campaign_name="Mobile_Dental_Event",
-            current_date_str=event_str_file,
-            digits_only_phone=False,              # set True if you want digits-only phone
+
+    # --- Fetch batch k+1 while batch k's workbooks and variant outputs are written ---
+    batches = [dates[i:i + max(1, dates_per_fetch)] for i in range(0, len(dates), max(1, dates_per_fetch))]
+    found_dates = set()
+    BOOKINGS_GRAPH.clear()  # fresh replica sync and medical index for every run
+    if workbook_workers is None:
+        workbook_workers = 1 if len(dates) == 1 else None
+    workbook_batch = WorkbookBatch(max_workers=workbook_workers)
+    # One stamp per run: names its delta files and keeps a patient to one file across the batch's dates
+    run_stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+
+    def _write_batch(batch, df):
+        params = dict(
+            dates=batch, refresh_cache=refresh_cache, output_dir=output_dir,
+            outreach_dir=outreach_dir, sheet_name=sheet_name, snapshot_dir=snapshot_dir,
+            delta_outreach=options.delta_outreach, workbook_batch=workbook_batch, run_stamp=run_stamp,
         )
-    except Exception as e:
-        print(f"⚠️ Outreach file generation skipped due to error: {e}")
-        out_csv = None
+        if df is None:
+            return None
+        if write_snapshots:
+            BOOKINGS_GRAPH.run("snapshots", **params)
+        found_dates.update(BOOKINGS_GRAPH.run("workbooks", **params))
+        outreach = []
+        for variant in options.variants:
+            written = BOOKINGS_GRAPH.run(VARIANTS[variant], **params)
+            if variant != "comparison":
+                outreach += _outreach_paths(written)
+        sent = outreach
+        if options.upload and outreach:
+            sent = delivered(upload_outreach(outreach, compress=options.compress_upload))
+        if options.delta_outreach and sent:
+            # Delta rows stay pending until their file is delivered: uploaded, or
+            # written for hand-off when this run doesn't upload
+            get_default_ledger().mark_sent([os.path.basename(p) for p in sent])
+        # This batch is done; keep only results shared across batches (medical index)
+        BOOKINGS_GRAPH.release(dates=batch)
+        return df if return_bookings else len(df)
 
-    return df
+    with workbook_batch:
+        frames = run_pipelined(
+            batches,
+            lambda batch: fetch_bookings(batch, refresh_cache),
+            _write_batch,
+            max_in_flight=max_in_flight,
+        )
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        print(f"⚠️ No dental bookings found for {label}.")
+        return pd.DataFrame() if return_bookings else 0
+
+    if date_range is None:
+        for d in dates:
+            if d.strftime("%Y-%m-%d") not in found_dates:
+                print(f"⚠️ No dental bookings found for {d.strftime('%Y-%m-%d')}.")
+
+    return _concat_bookings(frames) if return_bookings else sum(frames)
 
 # ---------- Run ----------
 if __name__ == "__main__":
-    run_main_template_query()
\ No newline at end of file
+    # Set DENTAL_PROFILE=<file.prof> to dump a cProfile of the whole run
+    with profiled(os.environ.get("DENTAL_PROFILE")):
+        run_main_template_query()
\ No newline at end of file
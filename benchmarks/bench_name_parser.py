@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from TEST import _split_full_name, split_full_names
+
+
+# --- Random names in every shape seen in appointments.description ---
+def make_names(n, seed=0):
+    rng = np.random.default_rng(seed)
+    last = rng.choice(["GARCIA", "Lopez", "O'NEIL", "Van Der Berg", "Nguyen", "Smith-Jones"], n)
+    first = rng.choice(["MARIA", "Jose", "Ann", "Jean-Luc", "Li"], n)
+    middle = rng.choice(["", " A", " Lee Ann", "  B"], n)
+    shape = rng.integers(0, 4, n)
+    names = np.where(
+        shape == 0, np.char.add(np.char.add(last, ", "), np.char.add(first, middle)),
+        np.where(
+            shape == 1, np.char.add(np.char.add(first, middle), np.char.add(" ", last)),
+            np.where(shape == 2, first, np.char.add(last, ","))
+        ),
+    )
+    return pd.Series(names, dtype=object)
+
+
+# --- Benchmark against the current apply + 3x unpack path ---
+# (equivalence with _split_full_name is checked in tests/test_name_parser.py)
+def benchmark(names):
+    start = time.perf_counter()
+    split_names = names.apply(_split_full_name)
+    _ = (split_names.apply(lambda t: t[0]), split_names.apply(lambda t: t[1]), split_names.apply(lambda t: t[2]))
+    rowwise = time.perf_counter() - start
+
+    start = time.perf_counter()
+    split_full_names(names)
+    vectorized = time.perf_counter() - start
+
+    print(f"row-wise apply:  {rowwise:.2f}s")
+    print(f"vectorized:      {vectorized:.2f}s  ({rowwise / vectorized:.1f}x)")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    names = make_names(n)
+    benchmark(names)
@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# --- Point the pipeline at the synthetic database before anything imports MAIN ---
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+DEFAULT_TOLERANCE = 1.25  # flag a stage when it is 25% slower than its baseline
+MIN_DELTA = {"seconds": 0.05, "peak_mb": 1.0}  # ignore jitter on very small stages
+
+
+class StageTimer:
+    """
+    Records wall time and tracemalloc peak (MB) per named stage.
+    tracemalloc slows allocation-heavy code (openpyxl especially), so with
+    trace_memory=False only wall time is recorded.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.results = {}
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            result = {"seconds": round(seconds, 4)}
+            line = f"  {name:<28} {seconds:8.3f}s"
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                result["peak_mb"] = round(peak / 1024 ** 2, 2)
+                line += f"  {peak / 1024 ** 2:9.1f} MB"
+            self.results[name] = result
+            print(line)
+
+
+def check_dates_of_birth(df, db_path, outreach_dir):
+    """
+    The export's DOBs (workbook frame and outreach CSVs) must be the people's real
+    dates of birth from the database; a DOB that went through the wrong cast shows
+    up as 1970-01-01 here. Raises AssertionError listing the mismatches.
+    """
+    import pandas as pd
+
+    conn = sqlite3.connect(db_path)
+    try:
+        truth = pd.read_sql_query(
+            "SELECT CAST(pp.med_rec_nbr AS INT) AS MRN, q.date_of_birth AS dob "
+            "FROM person q INNER JOIN patient pp ON pp.person_id = q.person_id",
+            conn,
+        )
+    finally:
+        conn.close()
+    truth = dict(zip(truth["MRN"].astype("int64"), truth["dob"]))
+    exported = {
+        "workbook DOB": (df["MRN"], pd.to_datetime(df["DOB"], errors="coerce").dt.strftime("%Y%m%d")),
+    }
+    csvs = [os.path.join(outreach_dir, f) for f in sorted(os.listdir(outreach_dir)) if f.endswith(".csv")]
+    if csvs:
+        outreach = pd.concat([pd.read_csv(f, dtype=str, keep_default_na=False) for f in csvs], ignore_index=True)
+        exported["outreach dob"] = (outreach["personID"], outreach["dob"])
+    problems = []
+    for label, (mrns, dobs) in exported.items():
+        mrns = pd.to_numeric(mrns, errors="coerce").astype("Int64").reset_index(drop=True)
+        expected = mrns.map(truth)
+        wrong = (expected.ne(dobs.reset_index(drop=True)) & mrns.notna()).to_numpy(dtype=bool)
+        if wrong.any():
+            problems.append(f"{label}: {int(wrong.sum())} of {len(wrong)} rows wrong (e.g. {dobs.iloc[int(wrong.argmax())]!r})")
+    assert not problems, "; ".join(problems)
+    print(f"  DOB check: {', '.join(f'{len(m)} {label}' for label, (m, _) in exported.items())} match the database")
+
+
+def run_pipeline(db_path, work_dir, n_dates=3, rows=20_000, trace_memory=True):
+    os.environ["NGPROD_CONN_STR"] = f"sqlite:///{db_path}"
+    os.environ["DENTAL_REPORTS_DIR"] = work_dir
+    os.environ["NGPROD_QUERY_CACHE"] = "off"
+
+    import pandas as pd
+    import MAIN
+    import TEST
+    from golden_diff import diff_frames
+    from last_visit_index import LastVisitIndex
+    from medical_replica import REPLICA_PATH, sync_medical_replica
+    from synthetic_ngprod import busiest_dental_dates
+
+    dates = [datetime.strptime(d, "%Y%m%d") for d in busiest_dental_dates(db_path, n_dates)]
+    timer = StageTimer(trace_memory)
+
+    # --- MAIN.py comparison ---
+    with timer.stage("replica_backfill"):
+        sync_medical_replica()
+    with timer.stage("replica_incremental"):
+        sync_medical_replica()
+    with timer.stage("last_visit_index_build"):
+        index = LastVisitIndex.from_replica(REPLICA_PATH)
+    with timer.stage("compare_run"):
+        MAIN.run_main_template_query(event_date=dates[0], output_dir=work_dir)
+
+    # --- TEST.py bookings export + outreach ---
+    with timer.stage("export_run"):
+        df = TEST.run_main_template_query(output_dir=work_dir, event_dates=dates)
+    if df is None or df.empty:
+        print("⚠️ No bookings returned; export stages skipped.")
+        return timer.results
+    check_dates_of_birth(df, db_path, os.path.join(work_dir, "Outreach"))
+
+    # --- Same stages on a frame scaled up to `rows` bookings ---
+    big = pd.concat([df] * max(1, rows // len(df)), ignore_index=True).head(rows)
+    with timer.stage("name_split"):
+        TEST.split_full_names(big["Full Patient Name"])
+    with timer.stage("window_flags"):
+        index.window_flags(big["MRN"], big["Appointment Date"])
+    with timer.stage("excel_export"):
+        MAIN.export_to_excel_simple({"Dental Bookings": big}, os.path.join(work_dir, "bench_export.xlsx"))
+    with timer.stage("outreach"):
+        TEST.generate_outreach_file(
+            big, os.path.join(work_dir, "bench_outreach"), location_recode=TEST.LOCATION_RECODE
+        )
+    edited = big.assign(**{"Phone Number": big["Phone Number"].where(big.index % 100 != 0, "0")})
+    with timer.stage("golden_diff"):
+        diff_frames(big, edited.iloc[1:])
+    return timer.results
+
+
+def appointment_count(db_path):
+    """Rows in the synthetic database's appointments table."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM appointments").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    regressions = []
+    for name, now in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        for metric, unit in (("seconds", "s"), ("peak_mb", " MB")):
+            if metric not in before or metric not in now:
+                continue
+            ratio = now[metric] / before[metric] if before[metric] else 1.0
+            regressed = ratio > tolerance and now[metric] - before[metric] > MIN_DELTA[metric]
+            marker = "❌ REGRESSION" if regressed else "ok"
+            print(
+                f"  {name:<28} {before[metric]:9.2f}{unit} -> {now[metric]:9.2f}{unit}  ({ratio:4.2f}x)  {marker}"
+            )
+            if regressed:
+                regressions.append(f"{name}.{metric}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a synthetic NGProd database.")
+    parser.add_argument("--appointments", type=int, default=100_000, help="scale of the synthetic database")
+    parser.add_argument("--db", help="existing synthetic database to reuse (built if missing)")
+    parser.add_argument("--rows", type=int, default=20_000, help="bookings rows for the export-side stages")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc for undistorted wall times")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="record this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    from synthetic_ngprod import build_database
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = args.db or os.path.join(work_dir, "ngprod_synthetic.sqlite")
+        if not os.path.exists(db_path):
+            print(f"Building synthetic database ({args.appointments:,} appointments)...")
+            build_database(db_path, args.appointments)
+
+        # A reused --db may be any size, so the baseline is keyed on what it really holds
+        appointments = appointment_count(db_path)
+
+        print("Stage timings:")
+        results = run_pipeline(db_path, work_dir, rows=args.rows, trace_memory=not args.no_memory)
+
+    # Timing-only runs are not comparable with traced ones, so they get their own baseline
+    scale_key = f"{appointments}:{args.rows}" + (":timing" if args.no_memory else "")
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    regressions = []
+    if scale_key in baselines and not args.update_baseline:
+        print(f"Against baseline ({args.baseline}, {appointments:,} appointments):")
+        regressions = compare_to_baseline(results, baselines[scale_key], args.tolerance)
+    else:
+        baselines[scale_key] = results
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"[✓] Baseline saved: {args.baseline}")
+
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,185 @@
+import argparse
+import os
+import sqlite3
+import time
+import uuid
+
+import numpy as np
+
+# --- Synthetic stand-in for the NGProd tables the queries touch ---
+# Column names and value formats follow NextGen (uniqueidentifier ids as
+# upper-case GUID text, char(8) YYYYMMDD dates, 'Y'/'N' indicators,
+# "LAST, FIRST M" descriptions). Values are random.
+
+DENTAL_LOCATIONS = [
+    "Goleta Neighborhood Dental Clinic", "Goleta Smile Van", "GO Neighborhood Dental Clinic OLD",
+    "Eastside Family Dental Clinic", "Eastside - ICC Dental", "Eastside Family Dental - Outreach",
+    "Z Eastside Family Dental Clinic", "Goleta Dental Mobile",
+]
+MEDICAL_LOCATIONS = [
+    "Goleta Neighborhood Clinic", "Eastside Neighborhood Clinic", "Westside Neighborhood Clinic",
+    "Downtown Neighborhood Clinic", "Isla Vista Medical", "Lompoc Family Medicine",
+    "Behavioral Health - Eastside", "Pediatrics - Goleta",
+]
+EVENTS = ["Dental Exam", "Cleaning", "Sealants", "Extraction", "Medical Visit", "Well Child", "Follow Up"]
+LAST_NAMES = ["GARCIA", "LOPEZ", "MARTINEZ", "NGUYEN", "SMITH", "JOHNSON", "HERNANDEZ", "O'NEIL", "VAN DER BERG"]
+FIRST_NAMES = ["MARIA", "JOSE", "ANA", "LUIS", "JEAN-LUC", "LI", "SARAH", "DAVID", "SOFIA"]
+MIDDLE = ["", " A", " M", " LEE ANN"]
+LANGUAGES = ["English", "Spanish; Castilian", "Mixteco", "Vietnamese", None]
+
+SCHEMA = """
+CREATE TABLE location_mstr (location_id TEXT PRIMARY KEY, location_name TEXT);
+CREATE TABLE provider_mstr (provider_id TEXT PRIMARY KEY, description TEXT);
+CREATE TABLE events (event_id TEXT PRIMARY KEY, event TEXT);
+CREATE TABLE person (
+    person_id TEXT PRIMARY KEY, date_of_birth TEXT, cell_phone TEXT, email_address TEXT,
+    language TEXT, sex TEXT, modify_timestamp TEXT
+);
+CREATE TABLE patient (person_id TEXT PRIMARY KEY, med_rec_nbr TEXT);
+CREATE TABLE patient_encounter (enc_id TEXT PRIMARY KEY, person_id TEXT);
+CREATE TABLE appointments (
+    appt_id TEXT PRIMARY KEY, person_id TEXT, location_id TEXT, rendering_provider_id TEXT,
+    event_id TEXT, appt_date TEXT, begintime TEXT, appt_kept_ind TEXT, description TEXT,
+    workflow_status TEXT, cancel_ind TEXT, delete_ind TEXT
+);
+"""
+
+INDEXES = """
+CREATE INDEX ix_appointments_date ON appointments (appt_date);
+CREATE INDEX ix_appointments_location ON appointments (location_id);
+CREATE INDEX ix_appointments_person ON appointments (person_id);
+CREATE INDEX ix_patient_encounter_person ON patient_encounter (person_id);
+"""
+
+
+def _yyyymmdd(days_since_epoch):
+    return np.datetime_as_string(days_since_epoch.astype("datetime64[D]"), unit="D").astype("U10")
+
+
+def _compact(dates_iso):
+    return np.char.replace(dates_iso, "-", "")
+
+
+def _guids(rng, n):
+    """`n` random uniqueidentifier values as upper-case text, in an object array for fancy indexing."""
+    raw = rng.integers(0, 256, (n, 16), dtype=np.uint8)
+    return np.array([str(uuid.UUID(bytes=bytes(row), version=4)).upper() for row in raw], dtype=object)
+
+
+def build_database(path, n_appointments=100_000, seed=0, first_year=2015, last_year=2026, chunk=500_000):
+    """
+    Create a fresh SQLite database at `path` with `n_appointments` appointments
+    spread over [first_year, last_year], roughly 8 appointments per person.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + SCHEMA)
+
+    locations = DENTAL_LOCATIONS + MEDICAL_LOCATIONS
+    location_ids, provider_ids, event_ids = _guids(rng, len(locations)), _guids(rng, 80), _guids(rng, len(EVENTS))
+    conn.executemany("INSERT INTO location_mstr VALUES (?, ?)", zip(location_ids.tolist(), locations))
+    conn.executemany(
+        "INSERT INTO provider_mstr VALUES (?, ?)",
+        (
+            (provider_ids[i - 1], f"Provider {i:03d}, DDS" if i <= 20 else f"Provider {i:03d}, MD")
+            for i in range(1, 81)
+        ),
+    )
+    conn.executemany("INSERT INTO events VALUES (?, ?)", zip(event_ids.tolist(), EVENTS))
+
+    # --- People and patients ---
+    n_people = max(n_appointments // 8, 10)
+    person_ids = _guids(rng, n_people)
+    dob = _compact(_yyyymmdd(rng.integers(-20000, 19000, n_people)))
+    phones = np.where(
+        rng.random(n_people) < 0.85,
+        np.char.add("(805) 555-", rng.integers(1000, 9999, n_people).astype("U4")),
+        "",
+    )
+    emails = np.where(
+        rng.random(n_people) < 0.5, np.char.add(np.arange(1, n_people + 1).astype("U"), "@example.org"), None
+    )
+    modified = _yyyymmdd(rng.integers(16000, 20500, n_people))
+    conn.executemany(
+        "INSERT INTO person VALUES (?, ?, ?, ?, ?, ?, ?)",
+        zip(
+            person_ids.tolist(), dob.tolist(), phones.tolist(), emails.tolist(),
+            rng.choice(np.array(LANGUAGES, dtype=object), n_people).tolist(),
+            rng.choice(["F", "M", "U"], n_people, p=[0.52, 0.46, 0.02]).tolist(),
+            modified.tolist(),
+        ),
+    )
+    mrns = np.char.zfill(rng.permutation(n_people * 3)[:n_people].astype("U"), 9)
+    conn.executemany("INSERT INTO patient VALUES (?, ?)", zip(person_ids.tolist(), mrns.tolist()))
+    n_enc = n_appointments // 2
+    conn.executemany(
+        "INSERT INTO patient_encounter VALUES (?, ?)",
+        zip(_guids(rng, n_enc).tolist(), person_ids[rng.integers(0, n_people, n_enc)].tolist()),
+    )
+    names = np.char.add(
+        np.char.add(rng.choice(LAST_NAMES, n_people), ", "),
+        np.char.add(rng.choice(FIRST_NAMES, n_people), rng.choice(MIDDLE, n_people)),
+    )
+
+    # --- Appointments, inserted in chunks ---
+    first_day = (np.datetime64(f"{first_year}-01-01") - np.datetime64("1970-01-01")).astype(int)
+    last_day = (np.datetime64(f"{last_year}-12-31") - np.datetime64("1970-01-01")).astype(int)
+    n_dental = len(DENTAL_LOCATIONS)
+    for start in range(0, n_appointments, chunk):
+        n = min(chunk, n_appointments - start)
+        person = rng.integers(0, n_people, n)
+        dental = rng.random(n) < 0.3
+        location = np.where(dental, rng.integers(0, n_dental, n), rng.integers(n_dental, len(locations), n))
+        provider = np.where(dental, rng.integers(0, 20, n), rng.integers(20, 80, n))
+        rows = zip(
+            np.char.add("A", np.arange(start, start + n).astype("U")).tolist(),
+            person_ids[person].tolist(),
+            location_ids[location].tolist(),
+            provider_ids[provider].tolist(),
+            event_ids[rng.integers(0, len(EVENTS), n)].tolist(),
+            _compact(_yyyymmdd(rng.integers(first_day, last_day + 1, n))).tolist(),
+            rng.choice(["0800", "0830", "0900", "1000", "1100", "1300", "1400", "1500"], n).tolist(),
+            np.where(rng.random(n) < 0.7, "Y", "N").tolist(),
+            names[person].tolist(),
+            rng.choice(["Checked Out", "Scheduled", "No Show"], n).tolist(),
+            np.where(rng.random(n) < 0.12, "Y", "N").tolist(),
+            np.where(rng.random(n) < 0.02, "Y", "N").tolist(),
+        )
+        conn.executemany("INSERT INTO appointments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+
+    conn.executescript(INDEXES)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def busiest_dental_dates(path, n=5):
+    """The `n` dates with the most dental bookings, as 'YYYYMMDD' strings."""
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute(
+            """
+            SELECT z.appt_date FROM appointments z
+            INNER JOIN location_mstr l ON l.location_id = z.location_id
+            WHERE l.location_name LIKE '%Dental%' AND z.cancel_ind = 'N'
+            GROUP BY z.appt_date ORDER BY COUNT(*) DESC, z.appt_date LIMIT ?
+            """,
+            (n,),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [r[0] for r in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a synthetic NGProd stand-in database (SQLite).")
+    parser.add_argument("path", help="SQLite file to create (overwritten)")
+    parser.add_argument("--appointments", type=int, default=100_000, help="number of appointments (10k-10M)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    build_database(args.path, args.appointments, args.seed)
+    print(f"[✓] Built {args.path} with {args.appointments:,} appointments in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,276 @@
+import argparse
+import os
+import re
+import socket
+import sys
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from config import REPORTS_DIR
+
+# pandas, SQLAlchemy and openpyxl load only once a subcommand actually runs,
+# so --help and argument errors return immediately.
+
+LOCK_PATH = os.path.join(REPORTS_DIR, "Logs", "dental_reports.lock")
+EXIT_LOCKED = 75  # EX_TEMPFAIL: another run holds the lock, try again later
+# Output variants of the bookings pipeline (see TEST.VARIANTS); kept here so --help stays import-free
+EXPORT_VARIANTS = ["all-clinics", "goleta", "comparison"]
+DATES_PER_FETCH = 31  # TEST.DATES_PER_FETCH, same reason
+
+
+# --- Date arguments: YYYYMMDD, YYYY-MM-DD, today/tomorrow/yesterday, or +N/-N days ---
+def parse_date(text):
+    relative = {"today": 0, "tomorrow": 1, "yesterday": -1}
+    value = text.strip().lower()
+    if value in relative:
+        return date.today() + timedelta(days=relative[value])
+    if value[:1] in "+-" and value[1:].isdigit():
+        return date.today() + timedelta(days=int(value))
+    for fmt in ("%Y%m%d", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"invalid date {text!r} (use YYYYMMDD, YYYY-MM-DD, today or +N/-N)")
+
+
+def _dates_from_args(parser, args):
+    """(event_dates, date_range) from --date or --from/--to; exactly one must be given."""
+    if args.dates and (args.start or args.end):
+        parser.error("use either --date or --from/--to, not both")
+    if args.dates:
+        return args.dates, None
+    if args.start and args.end:
+        if args.end < args.start:
+            parser.error("--to is before --from")
+        return None, (args.start, args.end)
+    if args.start or args.end:
+        parser.error("--from and --to must be given together")
+    parser.error("a date is required (--date, or --from/--to)")
+
+
+# --- Lock file so overlapping scheduled runs don't collide ---
+def _pid_alive(pid):
+    """Whether process `pid` is running on this machine."""
+    if os.name == "nt":
+        # os.kill(pid, 0) would terminate the process on Windows; ask for its exit code instead
+        import ctypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return ctypes.get_last_error() == 5  # ERROR_ACCESS_DENIED: it exists
+        try:
+            code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _lock_holder(path):
+    """(text, pid, host) of the lock file; pid/host None when unreadable, host None for old-format locks."""
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read().strip()
+    except FileNotFoundError:
+        return None, None, None
+    match = re.match(r"pid (\d+)(?: on (\S+))?", text)
+    return text, (int(match.group(1)) if match else None), (match.group(2) if match else None)
+
+
+@contextmanager
+def run_lock(path=LOCK_PATH):
+    """
+    Hold an exclusive lock file (holding "pid N on HOST since ...") for the block.
+    A lock is only broken when it names a process on this host that is no longer
+    running, however long ago it was taken, so a long multi-month run keeps its lock.
+    Yields False (without running anything) when another live run holds it.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    host = socket.gethostname()
+    text, pid, holder_host = _lock_holder(path)
+    if pid is not None and (holder_host or host) == host and not _pid_alive(pid):
+        print(f"⚠️ Removing lock left by a run that is no longer running ({text}): {path}")
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            holder = f.read().strip()
+        print(f"⏳ Another run holds {path} ({holder}); exiting.")
+        yield False
+        return
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(f"pid {os.getpid()} on {host} since {datetime.now().isoformat(timespec='seconds')}")
+    try:
+        yield True
+    finally:
+        os.remove(path)
+
+
+# --- Subcommands ---
+def cmd_compare(args, event_dates, date_range):
+    """Dental vs kept-medical MRN comparison (MAIN.py), one workbook per date."""
+    import MAIN
+    from last_visit_index import LastVisitIndex
+    from medical_replica import sync_medical_replica
+
+    if date_range is not None:
+        start, end = date_range
+        event_dates = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    # One replica sync and index build serve every date
+    sync_medical_replica()
+    medical_index = LastVisitIndex.from_replica()
+    for d in sorted(set(event_dates)):
+        MAIN.run_main_template_query(
+            event_date=datetime.combine(d, datetime.min.time()), output_dir=args.output_dir,
+            medical_index=medical_index,
+        )
+    return 0
+
+
+def cmd_export(args, event_dates, date_range, variants=None):
+    """Bookings workbooks plus the chosen variants (TEST.py); one query/clean pass serves them all."""
+    import TEST
+
+    options = TEST.ExportOptions(
+        variants=tuple(variants or args.variants or ["all-clinics"]),
+        outreach_dir=args.outreach_dir,
+        delta_outreach=args.delta,
+        upload=args.upload,
+        compress_upload=args.compress_upload,
+    )
+    # Nothing here reads the combined frame, so batches are freed as they are written
+    TEST.run_main_template_query(
+        output_dir=args.output_dir,
+        event_dates=event_dates,
+        date_range=date_range,
+        refresh_cache=args.refresh_cache,
+        options=options,
+        dates_per_fetch=args.dates_per_fetch,
+        workbook_workers=args.workbook_workers,
+        return_bookings=False,
+    )
+    return 0
+
+
+def cmd_outreach(args, event_dates, date_range):
+    """Bookings workbooks plus the Goleta Dental outreach CSV (Expected Dental Appointment Export.py)."""
+    return cmd_export(args, event_dates, date_range, variants=["goleta"])
+
+
+def cmd_rollups(args, event_dates, date_range):
+    """Bring the daily rollups up to date for the dates, then print (or export) them grouped by --by."""
+    import MAIN
+    from last_visit_index import LastVisitIndex
+    from medical_replica import sync_medical_replica
+    from rollups import get_default_rollups
+
+    if date_range is not None:
+        start, end = date_range
+        dates = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    else:
+        dates = sorted(set(event_dates))
+        start, end = dates[0], dates[-1]
+    rollups = get_default_rollups()
+    # Always update: settled dates still get seen_in_medical recomputed from the replica
+    sync_medical_replica()
+    rollups.update(dates, LastVisitIndex.from_replica(), refresh=args.refresh_cache)
+    table = rollups.query(start, end, by=args.by or ["location"])
+    if args.output:
+        MAIN.export_to_excel_simple({"Rollups": table}, args.output)
+    else:
+        print(table.to_string(index=False))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Dental booking reports without prompts, for Task Scheduler/cron.",
+    )
+    parser.add_argument("--lock-file", default=LOCK_PATH, help=f"lock guarding overlapping runs (default: {LOCK_PATH})")
+    parser.add_argument("--no-lock", action="store_true", help="run without taking the lock")
+    parser.add_argument("--profile", metavar="FILE", help="dump a cProfile of the run to FILE")
+
+    dates = argparse.ArgumentParser(add_help=False)
+    dates.add_argument(
+        "--date", dest="dates", action="append", type=parse_date, metavar="DATE",
+        help="event date (repeatable): YYYYMMDD, YYYY-MM-DD, today, tomorrow or +N/-N days",
+    )
+    dates.add_argument("--from", dest="start", type=parse_date, metavar="DATE", help="first date of a range")
+    dates.add_argument("--to", dest="end", type=parse_date, metavar="DATE", help="last date of a range (inclusive)")
+    dates.add_argument("--output-dir", default=REPORTS_DIR, help=f"where workbooks go (default: {REPORTS_DIR})")
+
+    exports = argparse.ArgumentParser(add_help=False)
+    exports.add_argument("--outreach-dir", help="where outreach CSVs go (default: <output-dir>/Outreach)")
+    exports.add_argument("--refresh-cache", action="store_true", help="re-query NGProd even if a cached result exists")
+    exports.add_argument(
+        "--delta", action="store_true", help="outreach only to patients not already sent in this campaign"
+    )
+    exports.add_argument(
+        "--dates-per-fetch", type=int, default=DATES_PER_FETCH, metavar="N",
+        help=f"event dates per NGProd query (default: {DATES_PER_FETCH}; 1 queries each date separately)",
+    )
+    exports.add_argument(
+        "--workbook-workers", type=int, metavar="N",
+        help="processes rendering workbooks (default: one per CPU; 1 writes them inline)",
+    )
+    exports.add_argument(
+        "--upload", action="store_true", help="send the outreach CSVs to the vendor SFTP drop (OUTREACH_SFTP_*)"
+    )
+    exports.add_argument("--compress-upload", action="store_true", help="gzip outreach CSVs before uploading")
+
+    sub = parser.add_subparsers(dest="command", required=True, metavar="{compare,export,outreach,rollups}")
+    compare = sub.add_parser("compare", parents=[dates], help="dental vs kept-medical MRN comparison")
+    compare.set_defaults(handler=cmd_compare)
+    export = sub.add_parser("export", parents=[dates, exports], help="bookings workbooks + per-clinic outreach")
+    export.add_argument(
+        "--variant", dest="variants", action="append", choices=EXPORT_VARIANTS,
+        help="output to build from the shared query (repeatable; default: all-clinics)",
+    )
+    export.set_defaults(handler=cmd_export)
+    outreach = sub.add_parser("outreach", parents=[dates, exports], help="bookings workbooks + Goleta Dental outreach")
+    outreach.set_defaults(handler=cmd_outreach)
+    rollups = sub.add_parser("rollups", parents=[dates], help="booked/kept/cancelled/seen-in-medical counts over a range")
+    rollups.add_argument(
+        "--by", action="append", choices=["appt_date", "location", "provider", "appointment"],
+        help="grouping (repeatable; default: location)",
+    )
+    rollups.add_argument("--output", metavar="XLSX", help="write the table to a workbook instead of printing it")
+    rollups.add_argument("--refresh-cache", action="store_true", help="re-roll every date in the range from NGProd")
+    rollups.set_defaults(handler=cmd_rollups)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    event_dates, date_range = _dates_from_args(parser, args)
+
+    from instrumentation import profiled
+
+    def run():
+        with profiled(args.profile or os.environ.get("DENTAL_PROFILE")):
+            return args.handler(args, event_dates, date_range)
+
+    if args.no_lock:
+        return run()
+    with run_lock(args.lock_file) as acquired:
+        return run() if acquired else EXIT_LOCKED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+import os
+
+# Kept free of heavy imports so the CLI can read it before pandas/SQLAlchemy load
+
+# Root folder for reports and local caches (override with DENTAL_REPORTS_DIR)
+REPORTS_DIR = os.environ.get("DENTAL_REPORTS_DIR", r"C:\Reports\Dental Booking Analysis")
@@ -0,0 +1,266 @@
+import os
+import sqlite3
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from MAIN import REPORTS_DIR, run_query_and_return
+
+DEMOGRAPHICS_PATH = os.path.join(REPORTS_DIR, "Cache", "demographics.sqlite")
+# person_ids per NGProd lookup (SQL Server allows ~2100 bound parameters)
+IDS_PER_QUERY = 1000
+# person rows are pulled with these expressions, so the values match what the bookings query used to join in.
+# date_of_birth comes back raw (char(8) YYYYMMDD) and is parsed in _upsert(): CAST(... AS DATE) is a real
+# date on SQL Server but a plain number on other backends, which pandas then reads as 1970-01-01.
+PERSON_COLUMNS = [
+    ("q.person_id", "person_id"),
+    ("q.date_of_birth", "DOB"),
+    ("q.cell_phone", "Phone Number"),
+    ("q.email_address", "Email"),
+    ("q.language", "Language"),
+    ("q.sex", "Sex at Birth"),
+    ("q.modify_timestamp", "modify_timestamp"),
+]
+DEMOGRAPHIC_FIELDS = ["DOB", "Phone Number", "Email", "Language", "Sex at Birth"]
+_STORED = ["person_id", "dob", "cell_phone", "email", "language", "sex", "modify_timestamp"]
+_BLANK_STRINGS = ["None", "nan"]
+# Applied once as rows are stored, not on every export
+LANGUAGE_RECODE = {"Spanish; Castilian": "Spanish"}
+
+
+def _person_key(value):
+    """person.person_id (uniqueidentifier) as upper-case GUID text, or None if it isn't one."""
+    if isinstance(value, uuid.UUID):
+        return str(value).upper()
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return None
+    try:
+        return str(uuid.UUID(str(value).strip())).upper()
+    except ValueError:
+        return None
+
+
+def _person_keys(values):
+    """Normalized keys for a column of person_ids; each distinct value is parsed once."""
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values.astype(object))
+    keys = np.array([_person_key(u) for u in uniques] + [None], dtype=object)
+    return pd.Series(keys[codes], index=values.index, dtype=object)
+
+
+def _unique_keys(person_ids):
+    return sorted({k for k in _person_keys(person_ids) if k is not None})
+
+
+def _person_sql(where):
+    select = ", ".join(f"{expr} AS [{name}]" for expr, name in PERSON_COLUMNS)
+    return f"SELECT {select} FROM person q WHERE {where}"
+
+
+def _clean_text(values):
+    """Stripped text with 'None'/'nan' strings as '' (what the exports used to redo on every run); nulls stay null."""
+    values = values.astype("string").str.strip()
+    return values.where(~values.isin(_BLANK_STRINGS) | values.isna(), "").astype(object)
+
+
+def _dob(values):
+    """char(8) YYYYMMDD dates of birth as datetime.date (what CAST AS DATE gave on NGProd); unparseable ones null."""
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values.astype("string").str.strip(), format="%Y%m%d", errors="coerce")
+    return values.dt.date
+
+
+def _mark_text(values):
+    """Highest modify_timestamp as text NGProd compares correctly (datetimes as ISO 8601 to the ms)."""
+    values = values.dropna()
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.max().strftime("%Y-%m-%dT%H:%M:%S.%f")[:23]
+    return str(values.astype(str).max())
+
+
+def _plain(value):
+    """sqlite3 binds only Python scalars; dates go in as ISO text, DOB ints/strings as-is."""
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class DemographicsDimension:
+    """
+    Local copy of the person fields the exports show, keyed by person_id (GUID
+    text, upper case) and cleaned once on the way in. ensure() fetches only people not seen before;
+    refresh_changed() re-pulls only rows whose person.modify_timestamp moved
+    past the stored high-water mark.
+    """
+
+    def __init__(self, path=DEMOGRAPHICS_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            # Copies keyed by an INTEGER person_id predate GUID keys and hold nothing
+            # usable: start them over (the high-water mark goes with them)
+            columns = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(person_dim)")}
+            if columns.get("person_id", "TEXT").upper() != "TEXT":
+                conn.executescript("DROP TABLE person_dim; DROP TABLE IF EXISTS dim_meta;")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS person_dim (
+                    person_id TEXT PRIMARY KEY,
+                    dob,
+                    cell_phone TEXT,
+                    email TEXT,
+                    language TEXT,
+                    sex TEXT,
+                    modify_timestamp TEXT
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS dim_meta (key TEXT PRIMARY KEY, value TEXT);
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def high_water(self):
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM dim_meta WHERE key = 'high_water'").fetchone()
+        return row[0] if row else None
+
+    def _set_high_water(self, conn, mark):
+        conn.execute("INSERT OR REPLACE INTO dim_meta (key, value) VALUES ('high_water', ?)", (mark,))
+
+    def _upsert(self, conn, df, only_existing=False):
+        rows = pd.DataFrame(
+            {
+                "person_id": _person_keys(df["person_id"]),
+                "dob": _dob(df["DOB"]),
+                "cell_phone": _clean_text(df["Phone Number"]),
+                "email": _clean_text(df["Email"]),
+                "language": df["Language"].replace(LANGUAGE_RECODE),
+                "sex": df["Sex at Birth"],
+                "modify_timestamp": df["modify_timestamp"].astype("string"),
+            }
+        ).dropna(subset=["person_id"])
+        values = [tuple(_plain(v) for v in row) for row in rows.astype(object).itertuples(index=False, name=None)]
+        if only_existing:
+            # Changed people we have never exported stay out; ensure() adds them when they show up
+            conn.executemany(
+                "UPDATE person_dim SET dob = ?, cell_phone = ?, email = ?, language = ?, sex = ?, modify_timestamp = ? "
+                "WHERE person_id = ?",
+                (v[1:] + v[:1] for v in values),
+            )
+        else:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO person_dim ({', '.join(_STORED)}) VALUES (?, ?, ?, ?, ?, ?, ?)", values
+            )
+        return len(values)
+
+    def refresh_changed(self):
+        """
+        Re-pull people modified since the high-water mark (>=, so rows stamped at
+        the mark itself are re-checked). The first call only records the mark.
+        Returns the number of changed rows fetched, or None if the query failed.
+        """
+        mark = self.high_water()
+        if mark is None:
+            df = run_query_and_return("SELECT MAX(q.modify_timestamp) AS [mark] FROM person q")
+            if df is None or df.empty or df["mark"].isna().all():
+                print("⚠️ Could not read person.modify_timestamp; demographics change detection skipped")
+                return None
+            with self._connect() as conn:
+                self._set_high_water(conn, _mark_text(df["mark"]))
+            return 0
+        df = run_query_and_return(_person_sql("q.modify_timestamp >= ?"), params=(mark,))
+        if df is None or df.columns.empty:
+            print("⚠️ Demographics change query failed; cached rows kept as they are")
+            return None
+        with self._connect() as conn:
+            if len(df):
+                self._upsert(conn, df, only_existing=True)
+                self._set_high_water(conn, max(mark, _mark_text(df["modify_timestamp"])))
+        if len(df):
+            print(f"✅ Demographics: {len(df)} person row(s) changed since {mark}")
+        return len(df)
+
+    def _known_ids(self, conn, ids):
+        known = set()
+        for i in range(0, len(ids), IDS_PER_QUERY):
+            chunk = ids[i:i + IDS_PER_QUERY]
+            cur = conn.execute(
+                f"SELECT person_id FROM person_dim WHERE person_id IN ({', '.join('?' for _ in chunk)})", chunk
+            )
+            known.update(row[0] for row in cur)
+        return known
+
+    def ensure(self, person_ids):
+        """Fetch and store people in `person_ids` that aren't in the dimension yet. Returns how many were added."""
+        ids = _unique_keys(person_ids)
+        with self._connect() as conn:
+            known = self._known_ids(conn, ids)
+        missing = [i for i in ids if i not in known]
+        added = 0
+        for i in range(0, len(missing), IDS_PER_QUERY):
+            chunk = missing[i:i + IDS_PER_QUERY]
+            df = run_query_and_return(
+                _person_sql(f"q.person_id IN ({', '.join('?' for _ in chunk)})"), params=tuple(chunk)
+            )
+            if df is None or df.columns.empty:
+                print("⚠️ Demographics lookup failed; those people will show blank fields")
+                continue
+            with self._connect() as conn:
+                added += self._upsert(conn, df)
+        return added
+
+    def lookup(self, person_ids):
+        """Stored fields for `person_ids`, one row per person, under the export column names."""
+        ids = _unique_keys(person_ids)
+        frames = []
+        with self._connect() as conn:
+            for i in range(0, len(ids), IDS_PER_QUERY):
+                chunk = ids[i:i + IDS_PER_QUERY]
+                frames.append(
+                    pd.read_sql_query(
+                        f"SELECT person_id, dob, cell_phone, email, language, sex FROM person_dim "
+                        f"WHERE person_id IN ({', '.join('?' for _ in chunk)})",
+                        conn,
+                        params=chunk,
+                    )
+                )
+        columns = ["person_id", "dob", "cell_phone", "email", "language", "sex"]
+        found = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+        return found.rename(
+            columns={"dob": "DOB", "cell_phone": "Phone Number", "email": "Email", "language": "Language", "sex": "Sex at Birth"}
+        )
+
+    def enrich(self, df, key="person_id"):
+        """
+        Left-join the demographic fields onto `df` by `key` in one vectorized merge
+        (fetching anyone new first). People not found in NGProd get null fields.
+        """
+        keys = _person_keys(df[key])
+        self.ensure(keys)
+        fields = self.lookup(keys).rename(columns={"person_id": "_person_key"})
+        fields["_person_key"] = fields["_person_key"].astype(object)
+        enriched = df.drop(columns=[c for c in DEMOGRAPHIC_FIELDS if c in df.columns]).assign(_person_key=keys.to_numpy())
+        enriched = enriched.merge(fields, how="left", on="_person_key", suffixes=("", "_dim")).drop(columns="_person_key")
+        enriched.index = df.index
+        return enriched
+
+
+_default_dimension = None
+
+
+def get_default_dimension():
+    global _default_dimension
+    if _default_dimension is None:
+        _default_dimension = DemographicsDimension()
+    return _default_dimension
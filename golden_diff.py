@@ -0,0 +1,252 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Row identity when --key is not given: the first of these present in both outputs
+KEY_CANDIDATES = ["MRN", "personID", "Person ID"]
+OUTPUT_EXTENSIONS = (".xlsx", ".csv", ".csv.gz", ".parquet")
+
+
+# --- Load any export/outreach output as {table name: DataFrame} ---
+def load_output(path, sheet=None):
+    """
+    Workbooks give one table per sheet (only `sheet` when given); CSV and
+    Parquet files give one table. A folder of Parquet partitions (the bookings
+    snapshot) loads as one table. CSVs are read as text, exactly as written.
+    """
+    lower = path.lower()
+    if os.path.isdir(path) or lower.endswith(".parquet"):
+        return {"": pd.read_parquet(path)}
+    if lower.endswith((".csv", ".csv.gz")):
+        return {"": pd.read_csv(path, dtype=str, keep_default_na=False)}
+    if lower.endswith(".xlsx"):
+        sheets = pd.read_excel(path, sheet_name=sheet if sheet is not None else None)
+        return sheets if isinstance(sheets, dict) else {sheet: sheets}
+    raise ValueError(f"Unsupported output type: {path} (expected one of {OUTPUT_EXTENSIONS})")
+
+
+class GoldenDiff:
+    """Rows added/removed/changed and the changed cells between two versions of one table."""
+
+    def __init__(self, key, added, removed, cells, changed_rows, rows_old, rows_new,
+                 columns_added=(), columns_removed=()):
+        self.key = key
+        self.added = added
+        self.removed = removed
+        self.cells = cells
+        self.changed_rows = changed_rows
+        self.rows_old = rows_old
+        self.rows_new = rows_new
+        self.columns_added = list(columns_added)
+        self.columns_removed = list(columns_removed)
+
+    @property
+    def identical(self):
+        return not (len(self.added) or len(self.removed) or self.changed_rows
+                    or self.columns_added or self.columns_removed)
+
+    def summary(self):
+        line = (
+            f"{self.rows_old} -> {self.rows_new} rows (key: {', '.join(self.key) or 'row number'}): "
+            f"+{len(self.added)} added, -{len(self.removed)} removed, "
+            f"{self.changed_rows} changed ({len(self.cells)} cells)"
+        )
+        if self.columns_added:
+            line += f"; new columns {self.columns_added}"
+        if self.columns_removed:
+            line += f"; dropped columns {self.columns_removed}"
+        return line
+
+
+def _key_columns(old, new, key):
+    if key:
+        missing = [k for k in key if k not in old.columns or k not in new.columns]
+        if missing:
+            raise KeyError(f"Key column(s) {missing} not in both outputs")
+        return list(key)
+    for candidate in KEY_CANDIDATES:
+        if candidate in old.columns and candidate in new.columns:
+            return [candidate]
+    return []
+
+
+def _joint_codes(a, b):
+    """
+    Dictionary-encode one column across both versions: equal values (NA included)
+    get equal int64 codes, so comparing rows is integer work instead of per-cell
+    string comparison. Columns whose dtypes disagree are compared as text.
+    """
+    if a.dtype != b.dtype:
+        a, b = a.astype("string"), b.astype("string")
+    codes, uniques = pd.factorize(pd.concat([a, b], ignore_index=True), use_na_sentinel=False)
+    return codes[:len(a)].astype("int64"), codes[len(a):].astype("int64"), len(uniques)
+
+
+def _occurrence(ids):
+    """0 for the first row with each id, 1 for the second, ... (in row order)."""
+    order = np.argsort(ids, kind="stable")
+    sorted_ids = ids[order]
+    starts = np.r_[0, np.flatnonzero(sorted_ids[1:] != sorted_ids[:-1]) + 1]
+    occurrence = np.empty(len(ids), dtype="int64")
+    occurrence[order] = np.arange(len(ids)) - np.repeat(starts, np.diff(np.r_[starts, len(ids)]))
+    return occurrence
+
+
+def _row_ids(key_codes, n_old, n_new):
+    """
+    One int64 id per row (old, new) from the key columns' joint codes plus an
+    occurrence number, so duplicate keys pair up in order. Row numbers without a key.
+    """
+    if not key_codes:
+        return np.arange(n_old, dtype="int64"), np.arange(n_new, dtype="int64")
+    combined = np.zeros(n_old + n_new, dtype="int64")
+    for codes, cardinality in key_codes:
+        combined = pd.factorize(combined * cardinality + codes)[0].astype("int64")  # keep the id space dense
+    stride = max(n_old, n_new, 1)
+    old_ids, new_ids = combined[:n_old], combined[n_old:]
+    return old_ids * stride + _occurrence(old_ids), new_ids * stride + _occurrence(new_ids)
+
+
+# --- Diff two tables: encode columns once, pair rows by key, compare codes cell by cell ---
+def diff_frames(old, new, key=None):
+    key = _key_columns(old, new, key)
+    columns = [c for c in old.columns if c in new.columns]
+    value_columns = [c for c in columns if c not in key]
+    encoded = {c: _joint_codes(old[c], new[c]) for c in columns}
+
+    # Row ids share one code space, so pairing old and new rows is a sorted search
+    old_ids, new_ids = _row_ids(
+        [(np.concatenate(encoded[k][:2]), encoded[k][2]) for k in key], len(old), len(new)
+    )
+    order = np.argsort(old_ids, kind="stable")
+    found = np.searchsorted(old_ids[order], new_ids).clip(max=max(len(old) - 1, 0))
+    matched = (old_ids[order][found] == new_ids) if len(old) else np.zeros(len(new), dtype=bool)
+    rows_new = np.flatnonzero(matched)
+    rows_old = order[found[matched]]
+    removed_mask = np.ones(len(old), dtype=bool)
+    removed_mask[rows_old] = False
+
+    # Row "hash" compare: a row changed when any of its value codes moved
+    differs = {c: encoded[c][0][rows_old] != encoded[c][1][rows_new] for c in value_columns}
+    row_changed = np.zeros(len(rows_new), dtype=bool)
+    for mask in differs.values():
+        row_changed |= mask
+
+    cells = []
+    for c, mask in differs.items():
+        if mask.any():
+            o, w = rows_old[mask], rows_new[mask]
+            part = new[key].iloc[w].reset_index(drop=True) if key else pd.DataFrame({"row": w + 1})
+            part["column"] = c
+            part["old"] = old[c].iloc[o].astype(object).to_numpy()
+            part["new"] = new[c].iloc[w].astype(object).to_numpy()
+            cells.append(part)
+    cell_columns = (key or ["row"]) + ["column", "old", "new"]
+    cells = pd.concat(cells, ignore_index=True) if cells else pd.DataFrame(columns=cell_columns)
+
+    return GoldenDiff(
+        key,
+        new.iloc[np.flatnonzero(~matched)].reset_index(drop=True),
+        old.iloc[np.flatnonzero(removed_mask)].reset_index(drop=True),
+        cells,
+        int(row_changed.sum()),
+        len(old),
+        len(new),
+        columns_added=[c for c in new.columns if c not in old.columns],
+        columns_removed=[c for c in old.columns if c not in new.columns],
+    )
+
+
+def _table_files(folder):
+    return sorted(f for f in os.listdir(folder) if f.lower().endswith(OUTPUT_EXTENSIONS))
+
+
+def diff_outputs(old_path, new_path, key=None, sheet=None):
+    """
+    {table label: GoldenDiff | "missing in old" | "missing in new"} for two output
+    files, or for two folders of outputs (paired by file name).
+    """
+    if os.path.isdir(old_path) and os.path.isdir(new_path) and (_table_files(old_path) or _table_files(new_path)):
+        results = {}
+        old_files, new_files = set(_table_files(old_path)), set(_table_files(new_path))
+        for name in sorted(old_files | new_files):
+            if name not in new_files:
+                results[name] = "missing in new"
+            elif name not in old_files:
+                results[name] = "missing in old"
+            else:
+                for label, result in diff_outputs(os.path.join(old_path, name), os.path.join(new_path, name), key, sheet).items():
+                    results[f"{name}{label}"] = result
+        return results
+
+    old_tables, new_tables = load_output(old_path, sheet), load_output(new_path, sheet)
+    results = {}
+    for table in list(old_tables) + [t for t in new_tables if t not in old_tables]:
+        label = f" [{table}]" if table else ""
+        if table not in new_tables:
+            results[label] = "missing in new"
+        elif table not in old_tables:
+            results[label] = "missing in old"
+        else:
+            results[label] = diff_frames(old_tables[table], new_tables[table], key)
+    return results
+
+
+def write_report(results, path):
+    """One workbook: a summary sheet, then changed cells/added/removed rows per table that differs."""
+    from MAIN import export_to_excel_simple
+
+    sheets = {
+        "Summary": pd.DataFrame(
+            {
+                "Table": list(results),
+                "Result": [r if isinstance(r, str) else ("identical" if r.identical else r.summary())
+                           for r in results.values()],
+            }
+        )
+    }
+    for i, (label, result) in enumerate(results.items(), start=1):
+        if isinstance(result, str) or result.identical:
+            continue
+        for part, df in (("Cells", result.cells), ("Added", result.added), ("Removed", result.removed)):
+            if len(df):
+                sheets[f"{i} {part}"] = df
+    export_to_excel_simple(sheets, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="golden_diff.py",
+        description="Compare two export/outreach outputs (xlsx, CSV, Parquet, or folders of them) row by row.",
+    )
+    parser.add_argument("old", help="golden (expected) output")
+    parser.add_argument("new", help="output to check")
+    parser.add_argument("--key", action="append", help=f"row key column (repeatable; default: first of {KEY_CANDIDATES})")
+    parser.add_argument("--sheet", help="compare only this workbook sheet")
+    parser.add_argument("--report", metavar="XLSX", help="also write the differences to a workbook")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    results = diff_outputs(args.old, args.new, args.key, args.sheet)
+    for label, result in results.items():
+        if isinstance(result, str):
+            print(f"❌ {label}: {result}")
+        elif result.identical:
+            print(f"✅ {label or os.path.basename(args.new)}: identical ({result.rows_new} rows)")
+        else:
+            print(f"❌ {label or os.path.basename(args.new)}: {result.summary()}")
+            if len(result.cells):
+                print(result.cells.head(10).to_string(index=False))
+    if args.report:
+        write_report(results, args.report)
+    differs = [r for r in results.values() if isinstance(r, str) or not r.identical]
+    print(f"[✓] Compared {len(results)} table(s) in {time.perf_counter() - started:.2f}s; {len(differs)} differ")
+    return 1 if differs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
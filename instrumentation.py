@@ -0,0 +1,130 @@
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from config import REPORTS_DIR
+
+# One id per run so all its stages can be grouped in the log. It is handed down
+# through the environment, so workbook worker processes log under the run that
+# started them rather than minting their own.
+RUN_ID = os.environ.get("DENTAL_RUN_ID") or f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+os.environ["DENTAL_RUN_ID"] = RUN_ID
+_log_lock = threading.Lock()
+# Deep memory_usage walks every object column, so it is only paid while profiling
+_deep_memory = False
+
+
+def run_log_path():
+    """JSON-lines run log: DENTAL_RUN_LOG, else <REPORTS_DIR>/Logs/run_log.jsonl ('off' disables)."""
+    path = os.environ.get("DENTAL_RUN_LOG")
+    if path:
+        return None if path.lower() == "off" else path
+    return os.path.join(REPORTS_DIR, "Logs", "run_log.jsonl")
+
+
+def _write_record(record):
+    path = run_log_path()
+    if path is None:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    line = json.dumps(record, default=str)
+    with _log_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+# --- Row and memory stats for whatever a stage consumes/produces ---
+def _frames(obj):
+    if isinstance(obj, pd.DataFrame):
+        return [obj]
+    if isinstance(obj, dict):
+        return [v for v in obj.values() if isinstance(v, pd.DataFrame)]
+    return []
+
+
+def frame_stats(obj):
+    """
+    (rows, MB) for a DataFrame or dict of DataFrames; (len, None) for other sized results.
+    MB is shallow (object columns count their pointers only) unless profiling is on.
+    """
+    frames = _frames(obj)
+    if frames:
+        rows = sum(len(f) for f in frames)
+        mem = sum(f.memory_usage(index=True, deep=_deep_memory).sum() for f in frames) / 1024 ** 2
+        return rows, round(mem, 3)
+    if obj is not None and hasattr(obj, "__len__") and not isinstance(obj, (str, bytes)):
+        return len(obj), None
+    return None, None
+
+
+# --- Context manager: time a block and log it ---
+@contextmanager
+def stage(name, **fields):
+    """
+    Time a block and append one JSON line to the run log. The yielded dict can be
+    filled in by the caller (e.g. rec["rows_out"] = len(df)).
+    """
+    record = {"run_id": RUN_ID, "stage": name, "started": datetime.now().isoformat(timespec="seconds")}
+    record.update(fields)
+    started = time.perf_counter()
+    try:
+        yield record
+        record["ok"] = True
+    except Exception as e:
+        record["ok"] = False
+        record["error"] = repr(e)
+        raise
+    finally:
+        record["seconds"] = round(time.perf_counter() - started, 4)
+        _write_record(record)
+
+
+# --- Decorator: stage() around a function, with rows/memory in and out ---
+def instrumented(name=None):
+    def decorator(fn):
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            data_in = next((a for a in list(args) + list(kwargs.values()) if _frames(a)), None)
+            rows_in, mem_in = frame_stats(data_in)
+            with stage(stage_name, rows_in=rows_in, mem_in_mb=mem_in) as record:
+                result = fn(*args, **kwargs)
+                record["rows_out"], record["mem_out_mb"] = frame_stats(result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+# --- Optional cProfile dump for deep dives ---
+@contextmanager
+def profiled(output_path=None):
+    """
+    Profile the block with cProfile and dump stats to `output_path` (no-op when None).
+    While it runs, the run log records deep memory usage.
+    """
+    global _deep_memory
+    if not output_path:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    _deep_memory = True
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        _deep_memory = False
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        profiler.dump_stats(output_path)
+        print(f"[✓] Profile saved: {output_path} (view with: python -m pstats {output_path})")
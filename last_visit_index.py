@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from medical_replica import REPLICA_PATH, open_replica
+
+# Composite key layout: mrn_code * _KEY_STRIDE + (day_number + _DAY_OFFSET)
+_DAY_OFFSET = 1 << 19
+_KEY_STRIDE = 1 << 20
+
+
+def _to_day_numbers(dates, n):
+    """Days since 1970-01-01 as int64, broadcast to length n (NaT -> -1 after offset)."""
+    dates = pd.to_datetime(pd.Series(np.broadcast_to(np.asarray(dates, dtype=object), (n,))), errors="coerce")
+    days = dates.to_numpy(dtype="datetime64[D]").astype("int64")
+    return np.where(dates.isna().to_numpy(), -1, days + _DAY_OFFSET)
+
+
+class LastVisitIndex:
+    """
+    Sorted, array-backed index of kept medical visit dates per MRN.
+    Answers "last kept medical visit on or before date X" for many
+    (MRN, event date) pairs with one searchsorted call.
+    """
+
+    def __init__(self, mrns, visit_dates):
+        mrns = pd.Series(mrns).reset_index(drop=True)
+        days = _to_day_numbers(visit_dates, len(mrns))
+        valid = mrns.notna().to_numpy() & (days >= 0)
+        codes, uniques = pd.factorize(mrns[valid].to_numpy(), sort=True)
+        self._mrns = pd.Index(uniques)
+        self._keys = np.sort(codes.astype("int64") * _KEY_STRIDE + days[valid])
+
+    @classmethod
+    def from_replica(cls, path=REPLICA_PATH):
+        conn = open_replica(path)
+        try:
+            df = pd.read_sql_query("SELECT DISTINCT mrn, appt_date FROM kept_medical", conn)
+        finally:
+            conn.close()
+        return cls(df["mrn"], pd.to_datetime(df["appt_date"], format="%Y%m%d", errors="coerce"))
+
+    def __len__(self):
+        return len(self._mrns)
+
+    @property
+    def mrns(self):
+        """Sorted unique MRNs with any kept medical visit (int64 array when MRNs are numeric)."""
+        return self._mrns.to_numpy()
+
+    def contains(self, mrns):
+        """True where the MRN has any kept medical visit on record."""
+        return self._mrns.get_indexer(pd.Series(mrns)) >= 0
+
+    def last_visit_before(self, mrns, event_dates):
+        """
+        Most recent kept medical date on or before each event date (NaT if none).
+        `event_dates` may be a single date or one date per MRN.
+        """
+        codes = self._mrns.get_indexer(pd.Series(mrns))
+        event_days = _to_day_numbers(event_dates, len(codes))
+        probe = codes.astype("int64") * _KEY_STRIDE + event_days
+        pos = np.searchsorted(self._keys, probe, side="right") - 1
+        hit = (codes >= 0) & (event_days >= 0) & (pos >= 0)
+        found_keys = self._keys[np.clip(pos, 0, None)] if len(self._keys) else np.zeros_like(probe)
+        hit &= (found_keys // _KEY_STRIDE) == codes
+        last_days = found_keys % _KEY_STRIDE - _DAY_OFFSET
+        return np.where(hit, last_days, np.iinfo("int64").min).astype("datetime64[D]")
+
+    def seen_within(self, mrns, event_dates, days):
+        """True where the last kept medical visit falls in (event - days, event]."""
+        last = self.last_visit_before(mrns, event_dates)
+        event = _to_day_numbers(event_dates, len(last)) - _DAY_OFFSET
+        gap = event - last.astype("int64")
+        return ~np.isnat(last) & (gap < days)
+
+    def window_flags(self, mrns, event_dates, windows=None):
+        """One boolean column per lookback window, e.g. {"6mo": 182, "12mo": 365}."""
+        if windows is None:
+            windows = {"6mo": 182, "12mo": 365, "24mo": 730}
+        last = self.last_visit_before(mrns, event_dates)
+        event = _to_day_numbers(event_dates, len(last)) - _DAY_OFFSET
+        gap = event - last.astype("int64")
+        flags = {"Last Kept Medical": last}
+        for label, days in windows.items():
+            flags[f"Seen Medical {label}"] = ~np.isnat(last) & (gap < days)
+        return pd.DataFrame(flags, index=getattr(mrns, "index", None))
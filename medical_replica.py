@@ -0,0 +1,176 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from MAIN import REPORTS_DIR, normalize_mrns, run_query_and_return
+from query_builder import build_appointment_query
+
+# --- Local replica settings ---
+REPLICA_PATH = os.path.join(REPORTS_DIR, "Cache", "kept_medical.sqlite")
+FIRST_APPT_DATE = "19000101"
+# Appointments are sometimes marked kept a few days late (or un-kept, or deleted),
+# so each sync replaces this many days before the high-water mark with a fresh pull.
+REFETCH_DAYS = 14
+# Bumped when the kept_medical layout changes; older replicas are rebuilt from scratch
+SCHEMA_VERSION = "2"
+MEDICAL_COLUMNS = [
+    ("z.appt_id", "appt_id"),
+    ("pp.med_rec_nbr", "MRN"),
+    ("z.appt_date", "appt_date"),
+    ("l.location_name", "Location Name"),
+]
+
+
+# --- Open (and create if needed) the local replica ---
+def open_replica(path=REPLICA_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS replica_meta (key TEXT PRIMARY KEY, value TEXT)")
+    row = conn.execute("SELECT value FROM replica_meta WHERE key = 'schema_version'").fetchone()
+    if row is None or row[0] != SCHEMA_VERSION:
+        # v1 stored MRNs as text; drop it and let the next sync backfill
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS kept_medical")
+            conn.execute("DELETE FROM replica_meta")
+            conn.execute(
+                "INSERT INTO replica_meta (key, value) VALUES ('schema_version', ?)", (SCHEMA_VERSION,)
+            )
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS kept_medical (
+            appt_id TEXT PRIMARY KEY,
+            mrn INTEGER NOT NULL,
+            appt_date TEXT NOT NULL,
+            location_name TEXT
+        );
+        CREATE INDEX IF NOT EXISTS ix_kept_medical_date ON kept_medical (appt_date);
+        CREATE INDEX IF NOT EXISTS ix_kept_medical_mrn ON kept_medical (mrn, appt_date);
+        """
+    )
+    return conn
+
+
+def get_high_water_mark(conn):
+    row = conn.execute("SELECT value FROM replica_meta WHERE key = 'high_water'").fetchone()
+    return row[0] if row else None
+
+
+# --- Upsert streamed chunks into the replica as they arrive ---
+class _ReplicaChunkWriter:
+    """
+    Replaces every replica row dated on or after `since` with the fetched ones: the
+    old rows go in the same transaction as the first chunk, so rows that stopped
+    being kept (or were deleted upstream) drop out of the replica.
+    """
+
+    def __init__(self, conn, since):
+        self.conn = conn
+        self.since = since
+        self.cleared = False
+        self.rows = 0
+        self.max_date = None
+
+    def clear_window(self):
+        if not self.cleared:
+            self.conn.execute("DELETE FROM kept_medical WHERE appt_date >= ?", (self.since,))
+            self.cleared = True
+
+    def add(self, chunk):
+        mrns = normalize_mrns(chunk["MRN"])
+        chunk = chunk[mrns.notna()]
+        if chunk.empty:
+            return
+        appt_dates = chunk["appt_date"].astype(str).str.slice(0, 10).str.replace("-", "")
+        with self.conn:
+            self.clear_window()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO kept_medical (appt_id, mrn, appt_date, location_name) "
+                "VALUES (?, ?, ?, ?)",
+                # sqlite3 can't bind numpy ints, so hand it plain Python ints
+                zip(
+                    chunk["appt_id"].astype(str),
+                    mrns[mrns.notna()].astype("int64").tolist(),
+                    appt_dates,
+                    chunk["Location Name"],
+                ),
+            )
+        self.rows += len(chunk)
+        self.max_date = max(filter(None, [self.max_date, appt_dates.max()]))
+
+    def result(self):
+        return self.rows
+
+
+# --- Pull only kept medical appointments newer than the high-water mark ---
+def sync_medical_replica(path=REPLICA_PATH, refetch_days=REFETCH_DAYS, chunksize=50_000):
+    """
+    Bring the local replica of kept non-dental appointments up to date.
+    Only rows on or after (high-water mark - refetch_days) are fetched from NGProd,
+    streamed in chunks straight into SQLite, and they replace the replica's rows
+    from that date on. The mark never passes today, so future-dated bookings
+    can't push the re-pulled window past days that may still change.
+    Returns the number of rows fetched.
+    """
+    today = datetime.now().strftime("%Y%m%d")
+    conn = open_replica(path)
+    try:
+        mark = get_high_water_mark(conn)
+        if mark is None:
+            since_dt = datetime.strptime(FIRST_APPT_DATE, "%Y%m%d")
+        else:
+            since_dt = datetime.strptime(min(mark, today), "%Y%m%d") - timedelta(days=refetch_days)
+        since_sql = since_dt.strftime("%Y%m%d")
+
+        sql_query_medical_new, params = build_appointment_query(
+            MEDICAL_COLUMNS,
+            since=since_dt,
+            locations="non_dental",
+            where=["z.appt_kept_ind = 'Y'"],
+            order_by=None,
+        )
+        writer = _ReplicaChunkWriter(conn, since_sql)
+        fetched = run_query_and_return(
+            sql_query_medical_new, chunksize=chunksize, accumulator=writer, params=params
+        )
+        if fetched is None:
+            # Rows already upserted are kept; the mark stays put so the next run re-pulls them
+            print(f"⚠️ Medical replica sync interrupted (high-water mark still {mark})")
+            return 0
+        with conn:
+            writer.clear_window()  # no-op unless no chunk had usable rows
+        if fetched == 0:
+            print(f"✅ Medical replica: no new kept rows since {since_sql} (high-water mark: {mark})")
+            return 0
+
+        new_mark = min(max(filter(None, [mark, writer.max_date])), today)
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO replica_meta (key, value) VALUES ('high_water', ?)",
+                (new_mark,),
+            )
+        print(f"✅ Medical replica synced: {fetched} rows since {since_sql} (high-water mark: {new_mark})")
+        return fetched
+    finally:
+        conn.close()
+
+
+# --- Answer MRN set questions from the local copy ---
+def medical_mrns_since(since=None, path=REPLICA_PATH):
+    """
+    Distinct MRNs (sorted int64 array) with a kept medical appointment after
+    `since` (datetime), or across all recorded history when `since` is None.
+    """
+    conn = open_replica(path)
+    try:
+        if since is None:
+            cur = conn.execute("SELECT DISTINCT mrn FROM kept_medical ORDER BY mrn")
+        else:
+            cur = conn.execute(
+                "SELECT DISTINCT mrn FROM kept_medical WHERE appt_date > ? ORDER BY mrn",
+                (since.strftime("%Y%m%d"),),
+            )
+        return np.fromiter((row[0] for row in cur), dtype="int64")
+    finally:
+        conn.close()
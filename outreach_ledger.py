@@ -0,0 +1,178 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from config import REPORTS_DIR
+
+LEDGER_PATH = os.path.join(REPORTS_DIR, "Cache", "outreach_ledger.sqlite")
+
+
+class OutreachLedger:
+    """
+    On-disk record of which personIDs already went out in which campaign.
+    The (campaign, person_id) primary key doubles as the membership index; the
+    first send is kept, so re-running a campaign never moves a patient's date.
+    Rows start 'pending' against the file(s) they were written to and only count
+    as contacted once mark_sent() confirms one of those files was delivered.
+    A patient pending from an earlier run goes out again in the next file; one
+    already written in the current run (same `run`) is not written twice.
+    """
+
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS contacted (
+                    campaign TEXT NOT NULL,
+                    person_id INTEGER NOT NULL,
+                    event_date TEXT,
+                    sent_on TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'sent',
+                    file TEXT,
+                    PRIMARY KEY (campaign, person_id)
+                ) WITHOUT ROWID
+                """
+            )
+            # Ledgers from before the pending state: everything in them was sent
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(contacted)")}
+            if "status" not in columns:
+                conn.execute("ALTER TABLE contacted ADD COLUMN status TEXT NOT NULL DEFAULT 'sent'")
+            if "file" not in columns:
+                conn.execute("ALTER TABLE contacted ADD COLUMN file TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS contacted_file ON contacted (file)")
+            # Every file a pending patient was written to, so delivery of any one of them counts
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS pending_files (
+                    campaign TEXT NOT NULL,
+                    person_id INTEGER NOT NULL,
+                    file TEXT NOT NULL,
+                    run TEXT,
+                    event_date TEXT,
+                    PRIMARY KEY (campaign, person_id, file)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS pending_files_file ON pending_files (file);
+                CREATE INDEX IF NOT EXISTS pending_files_run ON pending_files (campaign, run);
+                """
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO pending_files (campaign, person_id, file, event_date) "
+                "SELECT campaign, person_id, file, event_date FROM contacted WHERE status = 'pending' AND file IS NOT NULL"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def contacted(self, campaign, run=None):
+        """
+        Sorted int64 array of personIDs already sent for `campaign` (pending ones
+        excluded), plus those written to any file in run `run` when given.
+        """
+        sql = "SELECT person_id FROM contacted WHERE campaign = ? AND status = 'sent'"
+        params = [campaign]
+        if run is not None:
+            sql += " UNION SELECT person_id FROM pending_files WHERE campaign = ? AND run = ?"
+            params += [campaign, run]
+        with self._connect() as conn:
+            cur = conn.execute(sql + " ORDER BY person_id", params)
+            return np.fromiter((row[0] for row in cur), dtype="int64")
+
+    def is_new(self, campaign, person_ids, run=None):
+        """
+        Boolean mask, True where the personID has not been sent for `campaign` nor
+        written earlier in run `run` (nulls count as new).
+        """
+        ids = pd.Series(person_ids).astype("Int64")
+        return ~ids.isin(self.contacted(campaign, run)).to_numpy(dtype=bool)
+
+    def record(self, campaign, person_ids, event_date=None, sent_on=None, file=None, run=None):
+        """
+        Add personIDs to `campaign`. With `file` they are pending on that file (written
+        in run `run`) until mark_sent(); without, they count as sent now. Sent entries
+        keep their first send. Returns contacted rows added or changed.
+        """
+        ids = [int(i) for i in pd.Series(person_ids).astype("Int64").dropna().unique()]
+        sent_on = (sent_on or date.today()).strftime("%Y-%m-%d")
+        status = "sent" if file is None else "pending"
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT INTO contacted (campaign, person_id, event_date, sent_on, status, file) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (campaign, person_id) DO UPDATE SET event_date = excluded.event_date, "
+                "sent_on = excluded.sent_on, status = excluded.status, file = excluded.file "
+                "WHERE contacted.status = 'pending'",
+                ((campaign, i, event_date, sent_on, status, file) for i in ids),
+            )
+            changed = conn.total_changes - before
+            if file is None:
+                conn.executemany(
+                    "DELETE FROM pending_files WHERE campaign = ? AND person_id = ?", ((campaign, i) for i in ids)
+                )
+            else:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO pending_files (campaign, person_id, file, run, event_date) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    ((campaign, i, file, run, event_date) for i in ids),
+                )
+            return changed
+
+    def mark_sent(self, files, sent_on=None):
+        """
+        Patients pending on any of `files` (names as passed to record()) become sent,
+        whichever of their files it was. Returns rows marked.
+        """
+        sent_on = (sent_on or date.today()).strftime("%Y-%m-%d")
+        with self._connect() as conn:
+            before = conn.total_changes
+            for f in files:
+                conn.execute(
+                    "UPDATE contacted SET status = 'sent', sent_on = ?, file = ? WHERE status = 'pending' "
+                    "AND (campaign, person_id) IN (SELECT campaign, person_id FROM pending_files WHERE file = ?)",
+                    (sent_on, f, f),
+                )
+            marked = conn.total_changes - before
+            for f in files:
+                conn.execute(
+                    "DELETE FROM pending_files WHERE (campaign, person_id) IN "
+                    "(SELECT campaign, person_id FROM pending_files WHERE file = ?)",
+                    (f,),
+                )
+            return marked
+
+    def forget(self, campaign, event_date=None):
+        """Drop a campaign's entries (only those for `event_date` when given) so they go out again."""
+        with self._connect() as conn:
+            if event_date is None:
+                conn.execute("DELETE FROM pending_files WHERE campaign = ?", (campaign,))
+                cur = conn.execute("DELETE FROM contacted WHERE campaign = ?", (campaign,))
+            else:
+                conn.execute(
+                    "DELETE FROM pending_files WHERE campaign = ? AND event_date = ?", (campaign, event_date)
+                )
+                cur = conn.execute(
+                    "DELETE FROM contacted WHERE campaign = ? AND event_date = ?", (campaign, event_date)
+                )
+            return cur.rowcount
+
+
+_default_ledger = None
+
+
+def get_default_ledger():
+    global _default_ledger
+    if _default_ledger is None:
+        _default_ledger = OutreachLedger()
+    return _default_ledger
@@ -0,0 +1,53 @@
+import queue
+import threading
+
+# Marks the end of the producer's output
+_DONE = object()
+
+
+def run_pipelined(items, produce, consume, max_in_flight=2):
+    """
+    Overlap produce(item) (e.g. a SQL fetch) with consume(item, produced) (e.g. file writes).
+    produce runs on one background thread, consume on the caller's thread, in item order.
+    At most `max_in_flight` produced results wait in the queue, so the producer blocks
+    rather than running ahead of a slow consumer.
+    Returns [consume(...) results]; an exception on either side stops both and is re-raised.
+    """
+    buffer = queue.Queue(maxsize=max(1, max_in_flight))
+    stop = threading.Event()
+
+    def _put(entry):
+        # Poll so the producer notices when the consumer has given up
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _producer():
+        try:
+            for item in items:
+                if stop.is_set() or not _put((item, produce(item), None)):
+                    return
+        except BaseException as e:
+            _put((None, None, e))
+            return
+        _put((_DONE, None, None))
+
+    worker = threading.Thread(target=_producer, name="pipeline-producer", daemon=True)
+    worker.start()
+    results = []
+    try:
+        while True:
+            item, produced, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                break
+            results.append(consume(item, produced))
+    finally:
+        stop.set()
+        worker.join()
+    return results
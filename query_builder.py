@@ -0,0 +1,120 @@
+import re
+import uuid
+
+from query_cache import run_query_cached
+
+# --- Joins off appointments z, keyed by the alias the SELECT/WHERE refer to ---
+# Only joins whose alias is actually used are emitted. patient_encounter is not
+# here: nothing reads from it, and joining it on appt_id only multiplied rows.
+JOINS = {
+    "l": "INNER JOIN location_mstr l ON l.location_id = z.location_id",
+    "x": "INNER JOIN provider_mstr x ON x.provider_id = z.rendering_provider_id",
+    "m": "INNER JOIN events m ON m.event_id = z.event_id",
+    "q": "INNER JOIN person q ON q.person_id = z.person_id",
+    "pp": "LEFT JOIN patient pp ON pp.person_id = z.person_id",
+}
+
+# Location ids change rarely; the id lookup is cached for a day
+LOCATION_TTL_SECONDS = 24 * 60 * 60
+DENTAL_LOCATION_PATTERN = "Dental"
+_location_ids = {}
+
+
+def _guid(value):
+    """location_mstr.location_id (uniqueidentifier) as canonical upper-case text; ValueError if it isn't one."""
+    return str(value if isinstance(value, uuid.UUID) else uuid.UUID(str(value).strip())).upper()
+
+
+# --- Dental/non-dental location ids, resolved once from location_mstr ---
+def dental_location_ids(refresh=False):
+    """
+    Sorted location_ids whose name contains 'Dental' (case-insensitive, like the
+    old LIKE '%Dental%'), as upper-case GUID text, or None when location_mstr
+    can't be read or returns an id that isn't a GUID.
+    """
+    if refresh or "dental" not in _location_ids:
+        df = run_query_cached(
+            "SELECT location_id, location_name FROM location_mstr",
+            ttl=LOCATION_TTL_SECONDS,
+            refresh=refresh,
+        )
+        if df is None or df.empty:
+            print("⚠️ Could not read location_mstr; falling back to a LIKE filter")
+            return None
+        dental = df["location_name"].fillna("").str.contains(DENTAL_LOCATION_PATTERN, case=False, regex=False)
+        try:
+            _location_ids["dental"] = sorted({_guid(i) for i in df.loc[dental, "location_id"].dropna()})
+        except ValueError as e:
+            print(f"⚠️ Unexpected location_id in location_mstr ({e}); falling back to a LIKE filter")
+            return None
+    return _location_ids["dental"]
+
+
+def _location_predicate(locations):
+    """WHERE fragment and params restricting z.location_id to dental / non-dental sites."""
+    ids = dental_location_ids()
+    op = "IN" if locations == "dental" else "NOT IN"
+    if ids is None:
+        like = "LIKE" if locations == "dental" else "NOT LIKE"
+        return f"l.location_name {like} ?", [f"%{DENTAL_LOCATION_PATTERN}%"]
+    if not ids:
+        # No dental locations at all: IN () is not valid SQL
+        return ("1 = 0" if locations == "dental" else "1 = 1"), []
+    # Every id went through uuid.UUID, so quoting it inline is safe and keeps a
+    # long id list clear of SQL Server's ~2100 bound-parameter limit
+    quoted = ", ".join(f"'{i}'" for i in ids)
+    # Dental ids all come from location_mstr, so IN on z needs no join; NOT IN goes
+    # through l so the INNER JOIN still drops bookings at locations missing from it
+    alias = "z" if locations == "dental" else "l"
+    return f"{alias}.location_id {op} ({quoted})", []
+
+
+def _aliases(sql):
+    return set(re.findall(r"\b([a-z]+)\.\w", sql))
+
+
+# --- Build one appointments query with bound parameters ---
+def build_appointment_query(
+    columns,
+    dates=None,
+    date_range=None,
+    since=None,
+    locations="dental",
+    where=(),
+    order_by="z.appt_date ASC",
+):
+    """
+    SELECT `columns` ([(expression, output name), ...]) from appointments z,
+    joining only the tables those expressions and `where` refer to.
+    Date filter (YYYYMMDD, bound): `dates` (list), `date_range` (inclusive (start, end))
+    or `since` (on or after).
+    `locations`: "dental", "non_dental" or None for no location filter.
+    Returns (sql, params) for run_query_and_return / run_query_cached.
+    """
+    conditions, params = [], []
+    if dates is not None:
+        conditions.append(f"z.appt_date IN ({', '.join('?' for _ in dates)})")
+        params += [d.strftime("%Y%m%d") for d in dates]
+    if date_range is not None:
+        conditions.append("z.appt_date BETWEEN ? AND ?")
+        params += [d.strftime("%Y%m%d") for d in date_range]
+    if since is not None:
+        conditions.append("z.appt_date >= ?")
+        params.append(since.strftime("%Y%m%d"))
+    if locations is not None:
+        predicate, location_params = _location_predicate(locations)
+        conditions.append(predicate)
+        params += location_params
+    conditions += list(where)
+
+    select_sql = ",\n    ".join(f"{expr} AS [{name}]" for expr, name in columns)
+    used = _aliases(select_sql + " " + " ".join(conditions) + " " + (order_by or ""))
+    join_sql = "".join(f"\n{join}" for alias, join in JOINS.items() if alias in used)
+
+    sql = f"SELECT\n    {select_sql}\nFROM appointments z{join_sql}"
+    if conditions:
+        sql += "\nWHERE\n    " + " AND\n    ".join(conditions)
+    if order_by:
+        sql += f"\nORDER BY {order_by}"
+    # A tuple, so SQLAlchemy binds it as one positional row rather than executemany
+    return sql, tuple(params)
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from MAIN import REPORTS_DIR, run_query_and_return
+
+# --- Cache settings ---
+CACHE_DIR = os.path.join(REPORTS_DIR, "Cache", "queries")
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+# Appointments older than this are treated as final and cached permanently
+SETTLED_AFTER_DAYS = 14
+# Results touching today/future dates are only reused briefly
+SHORT_TTL_SECONDS = 15 * 60
+
+
+# Bumped when cached frames change shape (v2: MRN stored as Int64), orphaning old entries
+CACHE_FORMAT = 2
+
+
+# --- Cache key: hash of whitespace-normalized SQL plus parameters ---
+def normalize_sql(query):
+    return re.sub(r"\s+", " ", query).strip().rstrip(";").strip()
+
+
+def cache_key(query, params=None):
+    payload = f"v{CACHE_FORMAT}\n" + normalize_sql(query) + "\n" + json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# --- TTL policy: permanent for settled dates, short for recent/future ones ---
+def ttl_for_dates(dates, settled_after_days=SETTLED_AFTER_DAYS, short_ttl=SHORT_TTL_SECONDS):
+    """None (keep forever) when every date is older than `settled_after_days`, else `short_ttl`."""
+    cutoff = date.today() - timedelta(days=settled_after_days)
+    days = [d.date() if isinstance(d, datetime) else d for d in dates]
+    if days and max(days) < cutoff:
+        return None
+    return short_ttl
+
+
+class QueryCache:
+    """
+    On-disk result cache. Each entry is one columnar file (Parquet when pyarrow
+    is installed, pickle otherwise); a small SQLite index tracks expiry and
+    last access for size-bounded LRU eviction.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    expires REAL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(os.path.join(self.cache_dir, "index.sqlite"), timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT path, expires FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            path, expires = row
+            if (expires is not None and expires < now) or not os.path.exists(path):
+                self._delete(conn, key, path)
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_pickle(path)
+
+    def put(self, key, df, ttl=None):
+        path = os.path.join(self.cache_dir, f"{key}.parquet")
+        tmp_path = f"{path}.tmp"
+        try:
+            df.to_parquet(tmp_path, index=False)
+        except (ImportError, ValueError, TypeError):
+            # No pyarrow, or object columns Parquet can't type: fall back to pickle
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            path = os.path.join(self.cache_dir, f"{key}.pkl")
+            tmp_path = f"{path}.tmp"
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, path, created, expires, last_access, size) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, path, now, None if ttl is None else now + ttl, now, os.path.getsize(path)),
+            )
+            self._evict(conn)
+
+    def invalidate(self, key):
+        with self._connect() as conn:
+            row = conn.execute("SELECT path FROM entries WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._delete(conn, key, row[0])
+
+    def clear(self):
+        with self._connect() as conn:
+            for key, path in conn.execute("SELECT key, path FROM entries").fetchall():
+                self._delete(conn, key, path)
+
+    def _delete(self, conn, key, path):
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _evict(self, conn):
+        """Drop expired entries, then least-recently-used ones until under max_bytes."""
+        now = time.time()
+        for key, path in conn.execute(
+            "SELECT key, path FROM entries WHERE expires IS NOT NULL AND expires < ?", (now,)
+        ).fetchall():
+            self._delete(conn, key, path)
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, path, size in conn.execute(
+            "SELECT key, path, size FROM entries ORDER BY last_access ASC"
+        ).fetchall():
+            self._delete(conn, key, path)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = QueryCache()
+    return _default_cache
+
+
+# --- Transparent cached front for run_query_and_return ---
+def run_query_cached(query, params=None, ttl=SHORT_TTL_SECONDS, refresh=False, bypass=False, cache=None):
+    """
+    Same result as run_query_and_return(query, params=params), served from the
+    on-disk cache when a fresh entry exists.
+    `ttl`: seconds to keep the result (None = permanent; see ttl_for_dates).
+    `refresh`: ignore any cached entry and overwrite it with a new result.
+    `bypass`: skip the cache entirely (no read, no write).
+    Empty results are never cached, since a failed query also returns an empty frame.
+    """
+    if bypass or os.environ.get("NGPROD_QUERY_CACHE", "").lower() in ("0", "off", "false"):
+        return run_query_and_return(query, params=params)
+
+    cache = cache or get_default_cache()
+    key = cache_key(query, params)
+    if not refresh:
+        df = cache.get(key)
+        if df is not None:
+            print(f"⚡ Served from query cache ({len(df)} rows)")
+            return df
+
+    df = run_query_and_return(query, params=params)
+    if df is not None and not df.empty:
+        cache.put(key, df, ttl=ttl)
+    return df
@@ -0,0 +1,289 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from MAIN import MEDICAL_WINDOW_DAYS, REPORTS_DIR, normalize_mrns
+from query_builder import build_appointment_query
+from query_cache import SETTLED_AFTER_DAYS, run_query_cached, ttl_for_dates
+
+ROLLUP_PATH = os.path.join(REPORTS_DIR, "Cache", "dental_rollups.sqlite")
+# Dates rolled up per NGProd query when backfilling a range
+DATES_PER_QUERY = 31
+
+ROLLUP_KEYS = ["appt_date", "location", "provider", "appointment"]
+ROLLUP_COUNTS = ["booked", "kept", "cancelled", "seen_in_medical"]
+# No cancel_ind filter here: cancelled bookings are counted too
+ROLLUP_COLUMNS = [
+    ("z.appt_date", "appt_date"),
+    ("l.location_name", "location"),
+    ("x.description", "provider"),
+    ("m.event", "appointment"),
+    ("z.appt_kept_ind", "kept_ind"),
+    ("z.cancel_ind", "cancel_ind"),
+    ("CAST(pp.med_rec_nbr AS INT)", "MRN"),
+]
+
+
+def _day(d):
+    return d.date() if isinstance(d, datetime) else d
+
+
+# --- One row per booking: rollup keys, flags and MRN ---
+def _classify_bookings(df):
+    """
+    booked: not cancelled; kept: booked and marked kept; cancelled: cancel_ind 'Y'.
+    MRN is the normalized medical record number (NaN when missing); rows without a
+    usable appt_date are dropped.
+    """
+    days = pd.to_datetime(df["appt_date"].astype(str), format="%Y%m%d", errors="coerce")
+    cancelled = df["cancel_ind"].eq("Y").to_numpy(dtype=bool)
+    booked = ~cancelled
+    frame = pd.DataFrame(
+        {
+            "appt_date": days.dt.strftime("%Y-%m-%d"),
+            "location": df["location"].fillna("Unassigned").astype(str),
+            "provider": df["provider"].fillna("Unassigned").astype(str),
+            "appointment": df["appointment"].fillna("Unassigned").astype(str),
+            "booked": booked,
+            "kept": booked & df["kept_ind"].eq("Y").to_numpy(dtype=bool),
+            "cancelled": cancelled,
+            "MRN": normalize_mrns(df["MRN"]),
+        }
+    )
+    return frame[frame["appt_date"].notna()]
+
+
+def _seen_in_medical(bookings, medical_index, window_days):
+    """True where a booking's patient had a kept medical visit within `window_days` before its date."""
+    seen = np.zeros(len(bookings), dtype=bool)
+    has_mrn = bookings["MRN"].notna().to_numpy()
+    if has_mrn.any():
+        seen[has_mrn] = medical_index.seen_within(
+            bookings["MRN"][has_mrn].astype("int64").to_numpy(),
+            pd.to_datetime(bookings["appt_date"][has_mrn], format="%Y-%m-%d"),
+            window_days,
+        )
+    return seen
+
+
+# --- One day's bookings -> counts per (date, location, provider, appointment type) ---
+def summarize_bookings(df, medical_index, window_days=MEDICAL_WINDOW_DAYS):
+    """
+    booked/kept/cancelled as in _classify_bookings; seen_in_medical: booked for a
+    patient with a kept medical visit within `window_days` before that appointment
+    date (the comparison workbook's rule).
+    """
+    return _count_bookings(_classify_bookings(df), medical_index, window_days)
+
+
+def _count_bookings(bookings, medical_index, window_days=MEDICAL_WINDOW_DAYS):
+    bookings = bookings.assign(
+        seen_in_medical=bookings["booked"].to_numpy() & _seen_in_medical(bookings, medical_index, window_days)
+    )
+    return bookings.groupby(ROLLUP_KEYS, sort=True, as_index=False)[ROLLUP_COUNTS].sum()
+
+
+class DentalRollups:
+    """
+    Materialized daily counts in SQLite. update() rolls up only dates not yet
+    stored, plus recent ones whose kept/cancel flags may still change (they are
+    rolled again until SETTLED_AFTER_DAYS have passed); query() aggregates any
+    range from the stored rows without touching NGProd.
+    seen_in_medical depends on the medical replica, which keeps filling in after a
+    date settles, so update() also recomputes it for settled dates from their
+    stored booked MRNs (booked_mrns) against the current index.
+    """
+
+    def __init__(self, path=ROLLUP_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS daily_rollup (
+                    appt_date TEXT NOT NULL,
+                    location TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    appointment TEXT NOT NULL,
+                    booked INTEGER NOT NULL,
+                    kept INTEGER NOT NULL,
+                    cancelled INTEGER NOT NULL,
+                    seen_in_medical INTEGER NOT NULL,
+                    PRIMARY KEY (appt_date, location, provider, appointment)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS booked_mrns (
+                    appt_date TEXT NOT NULL,
+                    location TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    appointment TEXT NOT NULL,
+                    mrn INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS booked_mrns_date ON booked_mrns (appt_date);
+                CREATE TABLE IF NOT EXISTS rolled_dates (
+                    appt_date TEXT PRIMARY KEY,
+                    settled INTEGER NOT NULL,
+                    rolled_at TEXT NOT NULL,
+                    mrns_stored INTEGER NOT NULL DEFAULT 0
+                ) WITHOUT ROWID;
+                """
+            )
+            # Rollups made before booked_mrns existed: their dates count as pending
+            # (mrns_stored 0) so the next update re-rolls them and stores their MRNs
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(rolled_dates)")}
+            if "mrns_stored" not in columns:
+                conn.execute("ALTER TABLE rolled_dates ADD COLUMN mrns_stored INTEGER NOT NULL DEFAULT 0")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def pending_dates(self, dates):
+        """The dates in `dates` that have no settled rollup (with its booked MRNs) yet."""
+        with self._connect() as conn:
+            settled = {
+                row[0] for row in conn.execute("SELECT appt_date FROM rolled_dates WHERE settled = 1 AND mrns_stored = 1")
+            }
+        return sorted({_day(d) for d in dates} - {datetime.strptime(s, "%Y-%m-%d").date() for s in settled})
+
+    def update(self, dates, medical_index, refresh=False):
+        """
+        Roll up whichever of `dates` are pending (all of them with `refresh`), then
+        recompute seen_in_medical for the rest from `medical_index`.
+        A date whose query fails is left pending for the next run. Returns the dates rolled.
+        """
+        todo = sorted({_day(d) for d in dates}) if refresh else self.pending_dates(dates)
+        rolled = []
+        cutoff = date.today() - timedelta(days=SETTLED_AFTER_DAYS)
+        for i in range(0, len(todo), DATES_PER_QUERY):
+            batch = todo[i:i + DATES_PER_QUERY]
+            sql, params = build_appointment_query(ROLLUP_COLUMNS, dates=batch, order_by=None)
+            df = run_query_cached(sql, params=params, ttl=ttl_for_dates(batch), refresh=refresh)
+            if df is None or df.columns.empty:
+                print(f"⚠️ Rollup query failed for {batch[0]}..{batch[-1]}; those dates stay pending")
+                continue
+            if len(df):
+                bookings = _classify_bookings(df)
+                counts = _count_bookings(bookings, medical_index)
+                mrns = bookings.loc[bookings["booked"] & bookings["MRN"].notna(), ROLLUP_KEYS + ["MRN"]]
+                mrns = mrns.astype({"MRN": "int64"})
+            else:
+                counts = pd.DataFrame(columns=ROLLUP_KEYS + ROLLUP_COUNTS)
+                mrns = pd.DataFrame(columns=ROLLUP_KEYS + ["MRN"])
+            day_strings = [d.strftime("%Y-%m-%d") for d in batch]
+            now = datetime.now().isoformat(timespec="seconds")
+            with self._connect() as conn:
+                conn.executemany("DELETE FROM daily_rollup WHERE appt_date = ?", ((d,) for d in day_strings))
+                conn.executemany("DELETE FROM booked_mrns WHERE appt_date = ?", ((d,) for d in day_strings))
+                conn.executemany(
+                    f"INSERT INTO daily_rollup ({', '.join(ROLLUP_KEYS + ROLLUP_COUNTS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    counts[ROLLUP_KEYS + ROLLUP_COUNTS].astype(object).itertuples(index=False, name=None),
+                )
+                conn.executemany(
+                    f"INSERT INTO booked_mrns ({', '.join(ROLLUP_KEYS)}, mrn) VALUES (?, ?, ?, ?, ?)",
+                    mrns.astype(object).itertuples(index=False, name=None),
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO rolled_dates (appt_date, settled, rolled_at, mrns_stored) VALUES (?, ?, ?, 1)",
+                    ((s, int(d < cutoff), now) for s, d in zip(day_strings, batch)),
+                )
+            rolled += batch
+        if rolled:
+            print(f"✅ Dental rollups updated for {len(rolled)} date(s)")
+        self.refresh_medical(sorted({_day(d) for d in dates} - set(rolled)), medical_index)
+        return rolled
+
+    def refresh_medical(self, dates, medical_index, window_days=MEDICAL_WINDOW_DAYS):
+        """
+        Recompute seen_in_medical for the stored `dates` from their booked MRNs, so
+        medical visits that reached the replica after a date settled are counted.
+        Dates rolled without stored MRNs are left as they are.
+        """
+        if not dates:
+            return
+        day_strings = {_day(d).strftime("%Y-%m-%d") for d in dates}
+        span = (min(day_strings), max(day_strings))
+        with self._connect() as conn:
+            stored = pd.read_sql_query(
+                "SELECT appt_date FROM rolled_dates WHERE mrns_stored = 1 AND appt_date BETWEEN ? AND ?",
+                conn,
+                params=span,
+            )
+            bookings = pd.read_sql_query(
+                f"SELECT {', '.join(ROLLUP_KEYS)}, mrn AS MRN FROM booked_mrns WHERE appt_date BETWEEN ? AND ?",
+                conn,
+                params=span,
+            )
+        stored = sorted(day_strings & set(stored["appt_date"]))
+        if not stored:
+            return
+        bookings = bookings[bookings["appt_date"].isin(stored)]
+        seen = bookings[ROLLUP_KEYS].assign(seen_in_medical=_seen_in_medical(bookings, medical_index, window_days))
+        seen = seen.groupby(ROLLUP_KEYS, sort=False, as_index=False)["seen_in_medical"].sum()
+        with self._connect() as conn:
+            conn.executemany("UPDATE daily_rollup SET seen_in_medical = 0 WHERE appt_date = ?", ((d,) for d in stored))
+            conn.executemany(
+                "UPDATE daily_rollup SET seen_in_medical = ? "
+                "WHERE appt_date = ? AND location = ? AND provider = ? AND appointment = ?",
+                seen[["seen_in_medical"] + ROLLUP_KEYS].astype(object).itertuples(index=False, name=None),
+            )
+
+    def query(self, start, end, by=("location",)):
+        """
+        Counts over [start, end] grouped by any of appt_date/location/provider/appointment,
+        with kept_rate (kept / booked) and medical_share (seen_in_medical / booked).
+        """
+        unknown = [b for b in by if b not in ROLLUP_KEYS]
+        if unknown:
+            raise ValueError(f"Unknown rollup dimension(s) {unknown}; choose from {ROLLUP_KEYS}")
+        group = ", ".join(by)
+        select = (group + ", ") if by else ""
+        sums = ", ".join(f"SUM({c}) AS {c}" for c in ROLLUP_COUNTS)
+        sql = f"SELECT {select}{sums} FROM daily_rollup WHERE appt_date BETWEEN ? AND ?"
+        if by:
+            sql += f" GROUP BY {group} ORDER BY {group}"
+        with self._connect() as conn:
+            df = pd.read_sql_query(sql, conn, params=(_day(start).strftime("%Y-%m-%d"), _day(end).strftime("%Y-%m-%d")))
+        df = df.dropna(subset=["booked"])  # SUM over no rows gives one all-NULL row
+        df[ROLLUP_COUNTS] = df[ROLLUP_COUNTS].astype("int64")
+        booked = df["booked"].where(df["booked"] > 0)
+        df["kept_rate"] = (df["kept"] / booked).round(3)
+        df["medical_share"] = (df["seen_in_medical"] / booked).round(3)
+        return df
+
+
+_default_rollups = None
+
+
+def get_default_rollups():
+    global _default_rollups
+    if _default_rollups is None:
+        _default_rollups = DentalRollups()
+    return _default_rollups
+
+
+def daily_summary(event_date, medical_index, rollups=None):
+    """Summary sheet for the comparison workbook: the event date's counts by location and provider."""
+    rollups = rollups or get_default_rollups()
+    rollups.update([event_date], medical_index)
+    return rollups.query(event_date, event_date, by=("location", "provider", "appointment")).rename(
+        columns={
+            "location": "Location Name",
+            "provider": "Provider Name",
+            "appointment": "Appointment Name",
+            "booked": "Booked",
+            "kept": "Kept",
+            "cancelled": "Cancelled",
+            "seen_in_medical": "Seen in Medical 6mo",
+            "kept_rate": "Kept Rate",
+            "medical_share": "Seen in Medical Share",
+        }
+    )
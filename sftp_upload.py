@@ -0,0 +1,292 @@
+import gzip
+import hashlib
+import os
+import posixpath
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import paramiko
+except ImportError:  # paramiko is optional; without it only the local stand-in client works
+    paramiko = None
+
+from instrumentation import stage
+
+# Outreach vendor drop (set these where the scheduled job runs)
+SFTP_HOST = os.environ.get("OUTREACH_SFTP_HOST")
+SFTP_PORT = int(os.environ.get("OUTREACH_SFTP_PORT", "22"))
+SFTP_USER = os.environ.get("OUTREACH_SFTP_USER")
+SFTP_KEY = os.environ.get("OUTREACH_SFTP_KEY")  # private key file; agent/default keys when unset
+SFTP_DIR = os.environ.get("OUTREACH_SFTP_DIR", ".")
+
+CHUNK_SIZE = 1 << 20
+PARTIAL_SUFFIX = ".part"      # bytes land here until the file is complete
+MANIFEST_SUFFIX = ".sha256"   # "<sha256>  <name>", written once the file is in place
+DEFAULT_WORKERS = 4
+
+
+def sha256_file(path):
+    """Hex SHA-256 of a local file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _manifest_line(digest, name):
+    return f"{digest}  {name}\n"
+
+
+# --- Bundle a day's outreach CSVs ---
+def bundle_outreach_files(paths, staging_dir=None, compress=False):
+    """
+    Files to send for one run: the outreach CSVs as written, or gzipped copies in
+    `staging_dir` (default <csv folder>/Upload). Compression is deterministic
+    (no timestamp in the header), so an unchanged CSV keeps its checksum and a
+    re-run resumes or skips it rather than sending it again.
+    """
+    paths = sorted({p for p in paths if p})
+    if not compress:
+        return paths
+    bundled = []
+    for path in paths:
+        target_dir = staging_dir or os.path.join(os.path.dirname(path), "Upload")
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, os.path.basename(path) + ".gz")
+        with open(path, "rb") as src, open(target, "wb") as raw:
+            with gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0) as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        bundled.append(target)
+    return bundled
+
+
+# --- Clients: paramiko over one SSH session, or a local folder standing in for the server ---
+class LocalSFTPClient:
+    """
+    The subset of paramiko.SFTPClient the uploader uses (stat/open/rename/remove/mkdir),
+    served from a local folder. Used to exercise uploads, resume and checksums without a server.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _local(self, path):
+        return os.path.join(self.root, *[p for p in path.split("/") if p not in ("", ".")])
+
+    def stat(self, path):
+        return os.stat(self._local(path))
+
+    def open(self, path, mode="r"):
+        return open(self._local(path), mode if "b" in mode else mode + "b")
+
+    def rename(self, old, new):
+        os.rename(self._local(old), self._local(new))
+
+    def posix_rename(self, old, new):
+        os.replace(self._local(old), self._local(new))
+
+    def remove(self, path):
+        os.remove(self._local(path))
+
+    def mkdir(self, path):
+        os.mkdir(self._local(path))
+
+    def close(self):
+        pass
+
+
+def paramiko_connector(host=SFTP_HOST, user=SFTP_USER, key_path=SFTP_KEY, port=SFTP_PORT):
+    """
+    Factory for SFTP clients that share one authenticated SSH transport; each call
+    opens another SFTP channel on it, so parallel transfers don't each pay for a handshake.
+    """
+    if paramiko is None:
+        raise ImportError("paramiko is required for SFTP uploads (pip install paramiko)")
+    if not host:
+        raise ValueError("No SFTP host; set OUTREACH_SFTP_HOST")
+    state = {"client": None}
+    lock = threading.Lock()
+
+    def connect():
+        with lock:
+            if state["client"] is None:
+                ssh = paramiko.SSHClient()
+                ssh.load_system_host_keys()
+                ssh.connect(host, port=port, username=user, key_filename=key_path)
+                state["client"] = ssh
+            return state["client"].open_sftp()
+
+    return connect
+
+
+class SFTPPool:
+    """Up to `size` SFTP clients from `connect()`, lent to one thread at a time."""
+
+    def __init__(self, connect, size=DEFAULT_WORKERS):
+        self.connect = connect
+        self.size = size
+        self._idle = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def client(self):
+        try:
+            client = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = len(self._all) < self.size
+                if grow:
+                    client = self.connect()
+                    self._all.append(client)
+            if not grow:
+                client = self._idle.get()
+        try:
+            yield client
+        finally:
+            self._idle.put(client)
+
+    def close(self):
+        for client in self._all:
+            client.close()
+        self._all.clear()
+
+
+# --- One file: skip if already there, resume a partial upload, publish with its manifest ---
+def _remote_size(client, path):
+    try:
+        return client.stat(path).st_size
+    except FileNotFoundError:
+        return None
+
+
+def _read_remote_text(client, path):
+    try:
+        with client.open(path, "rb") as f:
+            return f.read().decode("utf-8", errors="replace")
+    except FileNotFoundError:
+        return None
+
+
+def _ensure_remote_dir(client, remote_dir):
+    """mkdir -p, tolerating folders that already exist."""
+    current = "/" if remote_dir.startswith("/") else ""
+    for part in [p for p in remote_dir.split("/") if p not in ("", ".")]:
+        current = posixpath.join(current, part)
+        if _remote_size(client, current) is None:
+            try:
+                client.mkdir(current)
+            except OSError:
+                if _remote_size(client, current) is None:
+                    raise
+
+
+def upload_file(client, local_path, remote_dir=SFTP_DIR):
+    """
+    Send one file and return "skipped", "resumed" or "uploaded".
+    Bytes go to <name>.part, with <name>.part.sha256 naming the file they belong
+    to. A partial left by an interrupted run is resumed when that manifest matches
+    the local file and the partial is no longer than it, so only the rest is sent
+    and the partial is never read back. The finished file is renamed into place
+    and <name>.sha256 written beside it, so a later run skips files whose manifest
+    and size already match.
+    """
+    name = os.path.basename(local_path)
+    remote = posixpath.join(remote_dir, name)
+    partial = remote + PARTIAL_SUFFIX
+    partial_manifest = partial + MANIFEST_SUFFIX
+    size = os.path.getsize(local_path)
+    digest = sha256_file(local_path)
+    manifest = _manifest_line(digest, name)
+
+    if _read_remote_text(client, remote + MANIFEST_SUFFIX) == manifest and _remote_size(client, remote) == size:
+        return "skipped"
+
+    offset = _remote_size(client, partial) or 0
+    if offset and (offset > size or _read_remote_text(client, partial_manifest) != manifest):
+        offset = 0  # stale or different partial: start over
+    if not offset:
+        with client.open(partial_manifest, "wb") as f:
+            f.write(manifest.encode("utf-8"))
+    with open(local_path, "rb") as src, client.open(partial, "ab" if offset else "wb") as dst:
+        src.seek(offset)
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    if _remote_size(client, partial) != size:
+        raise IOError(f"{remote}: size mismatch after upload")
+
+    if hasattr(client, "posix_rename"):
+        client.posix_rename(partial, remote)
+    else:
+        if _remote_size(client, remote) is not None:
+            client.remove(remote)
+        client.rename(partial, remote)
+    with client.open(remote + MANIFEST_SUFFIX, "wb") as f:
+        f.write(manifest.encode("utf-8"))
+    client.remove(partial_manifest)
+    return "resumed" if offset else "uploaded"
+
+
+# --- Many files in parallel over a pooled session ---
+def upload_files(paths, remote_dir=SFTP_DIR, connect=None, workers=DEFAULT_WORKERS):
+    """
+    Upload `paths` on `workers` threads sharing a pool of SFTP clients from
+    `connect()` (default: paramiko to OUTREACH_SFTP_HOST). A failed file is
+    reported and left for the next run to resume; the others still go.
+    Returns {local path: "skipped" | "resumed" | "uploaded" | "failed: <error>"}.
+    """
+    paths = list(paths)
+    if not paths:
+        return {}
+    pool = SFTPPool(connect or paramiko_connector(), size=max(1, min(workers, len(paths))))
+
+    def _one(path):
+        started = time.perf_counter()
+        try:
+            with pool.client() as client:
+                status = upload_file(client, path, remote_dir)
+        except Exception as e:
+            status = f"failed: {e!r}"
+        return path, status, time.perf_counter() - started
+
+    results = {}
+    with stage("sftp_upload", files=len(paths), bytes=sum(os.path.getsize(p) for p in paths)) as rec:
+        try:
+            with pool.client() as client:
+                _ensure_remote_dir(client, remote_dir)
+            with ThreadPoolExecutor(max_workers=pool.size) as executor:
+                for path, status, seconds in executor.map(_one, paths):
+                    results[path] = status
+                    print(f"📡 {status}: {os.path.basename(path)} ({seconds:.1f}s)")
+        finally:
+            pool.close()
+        failed = [p for p, s in results.items() if s.startswith("failed")]
+        rec["failed"] = len(failed)
+    if failed:
+        print(f"❌ {len(failed)} of {len(paths)} file(s) not uploaded; re-run to resume them")
+    return results
+
+
+def upload_outreach(paths, remote_dir=SFTP_DIR, compress=False, connect=None, workers=DEFAULT_WORKERS):
+    """
+    Bundle outreach CSVs (optionally gzipped) and upload them; skipped when no SFTP
+    host is configured. Returns upload_files() statuses keyed by the CSV paths given
+    (not the .gz copies), so callers can tell which of their files went out.
+    """
+    if connect is None and not SFTP_HOST:
+        print("⚠️ OUTREACH_SFTP_HOST not set; outreach upload skipped")
+        return {}
+    paths = sorted({p for p in paths if p})
+    bundled = bundle_outreach_files(paths, compress=compress)
+    results = upload_files(bundled, remote_dir, connect, workers)
+    return {path: results[sent] for path, sent in zip(paths, bundled) if sent in results}
+
+
+def delivered(results):
+    """The paths in upload_outreach()/upload_files() results that are now on the server."""
+    return [p for p, status in results.items() if status in ("skipped", "resumed", "uploaded")]
@@ -0,0 +1,77 @@
+import os
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # pyarrow is optional; without it no snapshots are written
+    pa = ds = None
+
+# Hive-style layout: <root>/event_date=YYYY-MM-DD/location=<Location Name>/part-0.parquet
+PARTITION_COLUMNS = ["event_date", "location"]
+COMPRESSION = "zstd"
+
+
+def _partition_dir(root, event_date):
+    return os.path.join(root, f"event_date={event_date}")
+
+
+# --- Write typed, compressed Parquet partitions for the R side ---
+def write_bookings_snapshot(df, root):
+    """
+    Write bookings as a Parquet dataset partitioned by event date and raw Location Name.
+    Types survive the hand-off: dates as date32, MRN as int64, text as string.
+    Each event date present in `df` is replaced as a whole, so a re-run leaves no
+    stale location partitions behind. Dates with no rows are left untouched (an
+    empty result may just be a failed query). Returns the number of rows written.
+    """
+    if pa is None:
+        print("⚠️ pyarrow not installed; Parquet snapshot skipped")
+        return 0
+    if df is None or df.empty:
+        return 0
+    day_strings = {d.strftime("%Y-%m-%d") for d in df["Appointment Date"].dropna().unique()}
+    for day in day_strings:
+        shutil.rmtree(_partition_dir(root, day), ignore_errors=True)
+
+    # Categorical columns go out as plain text, so the R side sees the same types as before
+    decoded = {
+        c: df[c].astype(df[c].cat.categories.dtype)
+        for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)
+    }
+    table = pa.Table.from_pandas(
+        df.assign(
+            **decoded,
+            event_date=pd.to_datetime(df["Appointment Date"]).dt.strftime("%Y-%m-%d"),
+            location=decoded.get("Location Name", df["Location Name"]).fillna("Unassigned"),
+        ),
+        preserve_index=False,
+    )
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=PARTITION_COLUMNS,
+        partitioning_flavor="hive",
+        file_options=ds.ParquetFileFormat().make_write_options(compression=COMPRESSION),
+        existing_data_behavior="overwrite_or_ignore",
+        basename_template="part-{i}.parquet",
+    )
+    print(f"🗂️ Parquet snapshot written: {root} ({len(df)} rows, {len(day_strings)} date(s))")
+    return len(df)
+
+
+def read_bookings_snapshot(root, dates=None, locations=None):
+    """Load snapshot partitions back into one DataFrame, optionally limited to dates/locations."""
+    if ds is None:
+        raise ImportError("pyarrow is required to read Parquet snapshots")
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+    expr = None
+    if dates is not None:
+        expr = ds.field("event_date").isin([d.strftime("%Y-%m-%d") for d in dates])
+    if locations is not None:
+        loc_expr = ds.field("location").isin(list(locations))
+        expr = loc_expr if expr is None else expr & loc_expr
+    return dataset.to_table(filter=expr).to_pandas()
@@ -0,0 +1,82 @@
+import threading
+
+from instrumentation import stage as log_stage
+
+
+def _freeze(value):
+    """Hashable form of a parameter value (lists/tuples/sets/dicts of hashables)."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_freeze(v) for v in value))
+    return value
+
+
+class StageGraph:
+    """
+    Named stages with declared upstream `inputs` and the run `params` they read.
+    run(name, **params) computes upstream stages first; every result is memoized
+    by (stage, the params it depends on directly or through its inputs), so
+    several downstream variants share one query/clean/normalize pass.
+    """
+
+    def __init__(self, name="pipeline"):
+        self.name = name
+        self.stages = {}
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, fn, inputs=(), params=()):
+        """Register fn(**inputs, **params) as stage `name`."""
+        missing = [i for i in inputs if i not in self.stages]
+        if missing:
+            raise KeyError(f"Stage {name!r} depends on unknown stage(s): {missing}")
+        self.stages[name] = (fn, tuple(inputs), tuple(params))
+        return fn
+
+    def stage(self, name, inputs=(), params=()):
+        """Decorator form of add()."""
+        return lambda fn: self.add(name, fn, inputs, params)
+
+    def depends_on(self, name):
+        """Every run param stage `name` reads, directly or through its inputs."""
+        fn, inputs, params = self.stages[name]
+        found = set(params)
+        for upstream in inputs:
+            found |= self.depends_on(upstream)
+        return found
+
+    def _key(self, name, params):
+        return name, _freeze({p: params.get(p) for p in sorted(self.depends_on(name))})
+
+    def run(self, name, **params):
+        if name not in self.stages:
+            raise KeyError(f"Unknown stage {name!r}; known: {sorted(self.stages)}")
+        key = self._key(name, params)
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+
+        fn, inputs, own_params = self.stages[name]
+        upstream = {i: self.run(i, **params) for i in inputs}
+        with log_stage(f"{self.name}.{name}"):
+            result = fn(**upstream, **{p: params.get(p) for p in own_params})
+        with self._lock:
+            self._memo[key] = result
+        return result
+
+    def release(self, **params):
+        """Forget memoized results computed with these param values (e.g. one finished batch)."""
+        frozen = {p: _freeze(v) for p, v in params.items()}
+        with self._lock:
+            for key in list(self._memo):
+                name, key_params = key
+                values = dict(key_params)
+                if all(p in values and values[p] == v for p, v in frozen.items()):
+                    del self._memo[key]
+
+    def clear(self):
+        with self._lock:
+            self._memo.clear()
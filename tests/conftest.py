@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Keep caches, ledgers and run logs out of the real reports folder, before any module reads config
+os.environ.setdefault("DENTAL_REPORTS_DIR", tempfile.mkdtemp(prefix="dental-tests-"))
+os.environ.setdefault("DENTAL_RUN_LOG", "off")
+os.environ.setdefault("NGPROD_QUERY_CACHE", "off")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,49 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import TEST
+from TEST import NAME_COLUMNS, _split_full_name, split_full_names
+
+# Edge cases the vectorized parser must agree on with _split_full_name
+EDGE_CASES = [
+    "DOE, JANE A", "Smith,  John", "Cher", "Mary Ann Jones", None, "", "  ",
+    "A,", "A, ", ", B", ",", "A B", "A, B, C", "x\t y\n z", " Doe , Jane Q Public ",
+    "A,B C", "a  b", "\xa0Jo\xa0Lee", "O'Neil-Smith, Mary-Kate", 5, np.nan,
+]
+
+
+# --- Every shape seen in appointments.description ---
+def _generated_names():
+    names = []
+    for last, first, middle in itertools.product(
+        ["GARCIA", "Lopez", "O'NEIL", "Van Der Berg", "Smith-Jones"],
+        ["MARIA", "Jean-Luc", "Li"],
+        ["", " A", " Lee Ann", "  B"],
+    ):
+        names += [f"{last}, {first}{middle}", f"{first}{middle} {last}", first, f"{last},"]
+    return names
+
+
+@pytest.fixture(params=["arrow", "regex"])
+def parser_path(request, monkeypatch):
+    if request.param == "arrow" and TEST.pc is None:
+        pytest.skip("pyarrow is not installed")
+    if request.param == "regex":
+        monkeypatch.setattr(TEST, "pc", None)
+    return request.param
+
+
+@pytest.mark.parametrize("names", [EDGE_CASES, _generated_names()], ids=["edge-cases", "generated"])
+def test_split_full_names_matches_row_wise_parser(parser_path, names):
+    names = pd.Series(names, dtype=object)
+    expected = [_split_full_name(x) for x in names]
+    got = list(split_full_names(names)[NAME_COLUMNS].itertuples(index=False, name=None))
+    assert got == expected
+
+
+def test_split_full_names_keeps_the_index(parser_path):
+    names = pd.Series(["DOE, JANE A", None], index=[7, 3], dtype=object)
+    assert split_full_names(names).index.tolist() == [7, 3]
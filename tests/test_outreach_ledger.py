@@ -0,0 +1,79 @@
+import os
+
+import pandas as pd
+
+import TEST
+from outreach_ledger import OutreachLedger
+
+CAMPAIGN = "Mobile_Dental_Event:goleta"
+
+
+def _bookings(mrns, location="Goleta Dental Mobile"):
+    return pd.DataFrame(
+        {
+            "Location Name": location,
+            "Full Patient Name": [f"PATIENT, NUMBER{m}" for m in mrns],
+            "MRN": mrns,
+            "DOB": "1985-03-12",
+            "Phone Number": "(805) 555-1234",
+            "Email": "",
+            "Language": "English",
+            "Sex at Birth": "F",
+        }
+    )
+
+
+def _write(df, folder, ledger, date, run_stamp="r1", **options):
+    return TEST.generate_outreach_file(
+        df, str(folder), campaign_name="Mobile_Dental_Event", current_date_str=date,
+        ledger=ledger, ledger_campaign=CAMPAIGN, run_stamp=run_stamp, **options
+    )
+
+
+def _ids(path):
+    return sorted(pd.read_csv(path, dtype=str)["personID"].astype(int))
+
+
+def test_two_dates_in_one_batch_write_each_patient_once(tmp_path):
+    ledger = OutreachLedger(str(tmp_path / "ledger.sqlite"))
+    first = _write(_bookings([101, 102]), tmp_path, ledger, "2025-08-12")
+    second = _write(_bookings([101, 102, 103]), tmp_path, ledger, "2025-08-14")
+
+    assert os.path.basename(first) == "Mobile_Dental_Event_2025-08-12_r1.csv"
+    assert _ids(first) == [101, 102]
+    assert _ids(second) == [103]
+    # Nothing counts as sent until a file is delivered
+    assert list(ledger.contacted(CAMPAIGN)) == []
+
+
+def test_failed_upload_of_second_file_keeps_first_file_patients_sent(tmp_path):
+    ledger = OutreachLedger(str(tmp_path / "ledger.sqlite"))
+    first = _write(_bookings([101, 102]), tmp_path, ledger, "2025-08-12")
+    _write(_bookings([101, 103]), tmp_path, ledger, "2025-08-14")
+
+    ledger.mark_sent([os.path.basename(first)])  # only the 08-12 file went out
+
+    assert list(ledger.contacted(CAMPAIGN)) == [101, 102]
+    retry = _write(_bookings([101, 102, 103]), tmp_path, ledger, "2025-08-14", run_stamp="r2")
+    assert _ids(retry) == [103]
+
+
+def test_pending_patient_goes_out_again_in_a_later_run(tmp_path):
+    ledger = OutreachLedger(str(tmp_path / "ledger.sqlite"))
+    _write(_bookings([101]), tmp_path, ledger, "2025-08-12")  # never uploaded
+    again = _write(_bookings([101]), tmp_path, ledger, "2025-08-12", run_stamp="r2")
+
+    assert os.path.basename(again) == "Mobile_Dental_Event_2025-08-12_r2.csv"
+    assert _ids(again) == [101]
+    assert ledger.mark_sent([os.path.basename(again)]) == 1
+    assert _write(_bookings([101]), tmp_path, ledger, "2025-08-13", run_stamp="r3") is None
+
+
+def test_patient_in_two_clinic_files_is_sent_when_either_is_delivered(tmp_path):
+    ledger = OutreachLedger(str(tmp_path / "ledger.sqlite"))
+    df = pd.concat([_bookings([101], "Goleta Dental Mobile"), _bookings([101], "Eastside Family Dental Clinic")])
+    paths = _write(df, tmp_path, ledger, "2025-08-12", location_recode=TEST.LOCATION_RECODE)
+
+    assert len(paths) == 2
+    ledger.mark_sent([os.path.basename(sorted(paths.values())[-1])])
+    assert list(ledger.contacted(CAMPAIGN)) == [101]
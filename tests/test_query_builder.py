@@ -0,0 +1,30 @@
+import sqlite3
+
+import query_builder
+
+DENTAL = "3B51DE2C-787A-42D0-8E1C-40A67959AAE9"
+MEDICAL = "4C370047-4DC7-4BD0-B090-BEAB6878B300"
+UNKNOWN = "5F82C2D9-CFEB-4FA3-A1D7-D982F8BD1045"
+
+
+def _run(monkeypatch, locations):
+    monkeypatch.setattr(query_builder, "dental_location_ids", lambda refresh=False: [DENTAL])
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE location_mstr (location_id TEXT, location_name TEXT)")
+    conn.execute("CREATE TABLE appointments (appt_id TEXT, location_id TEXT, appt_date TEXT)")
+    conn.executemany("INSERT INTO location_mstr VALUES (?, ?)", [(DENTAL, "Goleta Dental"), (MEDICAL, "Goleta Medical")])
+    conn.executemany(
+        "INSERT INTO appointments VALUES (?, ?, '20250812')",
+        [("a1", DENTAL), ("a2", MEDICAL), ("a3", UNKNOWN), ("a4", None)],
+    )
+    sql, params = query_builder.build_appointment_query([("z.appt_id", "id")], locations=locations, order_by="z.appt_id")
+    return [row[0] for row in conn.execute(sql.replace("[id]", "id"), params)]
+
+
+def test_dental_filter_keeps_only_dental_locations(monkeypatch):
+    assert _run(monkeypatch, "dental") == ["a1"]
+
+
+def test_non_dental_filter_keeps_inner_join_semantics(monkeypatch):
+    # Bookings at locations missing from location_mstr were dropped by the old INNER JOIN
+    assert _run(monkeypatch, "non_dental") == ["a2"]
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+import rollups
+from last_visit_index import LastVisitIndex
+
+SETTLED_DAY = date.today() - timedelta(days=rollups.SETTLED_AFTER_DAYS + 30)
+
+
+def _bookings(mrns):
+    return pd.DataFrame(
+        {
+            "appt_date": SETTLED_DAY.strftime("%Y%m%d"),
+            "location": "Goleta Dental",
+            "provider": "Dr. Smile",
+            "appointment": "Cleaning",
+            "kept_ind": "Y",
+            "cancel_ind": "N",
+            "MRN": mrns,
+        }
+    )
+
+
+def _index(visits):
+    return LastVisitIndex(list(visits), pd.to_datetime(list(visits.values())))
+
+
+def test_settled_date_picks_up_late_medical_visits(tmp_path, monkeypatch):
+    queries = []
+
+    def fake_query(sql, params=None, ttl=None, refresh=False):
+        queries.append(params)
+        return _bookings([101, 102, 103])
+
+    monkeypatch.setattr(rollups, "run_query_cached", fake_query)
+    store = rollups.DentalRollups(str(tmp_path / "rollups.sqlite"))
+    visit = SETTLED_DAY - timedelta(days=30)
+
+    assert store.update([SETTLED_DAY], _index({101: visit})) == [SETTLED_DAY]
+    assert store.query(SETTLED_DAY, SETTLED_DAY)["seen_in_medical"].tolist() == [1]
+
+    # The date is settled, so NGProd is not asked again, but the later visit is counted
+    assert store.update([SETTLED_DAY], _index({101: visit, 102: visit})) == []
+    assert len(queries) == 1
+    table = store.query(SETTLED_DAY, SETTLED_DAY)
+    assert table[["booked", "kept", "seen_in_medical"]].values.tolist() == [[3, 3, 2]]
+
+
+def test_rollups_without_stored_mrns_are_rolled_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(rollups, "run_query_cached", lambda *a, **k: _bookings([101]))
+    path = str(tmp_path / "rollups.sqlite")
+    store = rollups.DentalRollups(path)
+    store.update([SETTLED_DAY], _index({}))
+    with store._connect() as conn:
+        conn.execute("UPDATE rolled_dates SET mrns_stored = 0")
+
+    assert rollups.DentalRollups(path).pending_dates([SETTLED_DAY]) == [SETTLED_DAY]
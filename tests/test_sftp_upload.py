@@ -0,0 +1,104 @@
+import gzip
+import os
+
+import pytest
+
+from sftp_upload import LocalSFTPClient, upload_file, upload_outreach
+
+
+class _Interrupted(Exception):
+    pass
+
+
+class _DroppingClient(LocalSFTPClient):
+    """Local stand-in whose connection drops after `limit` bytes of a .part upload."""
+
+    def __init__(self, root, limit):
+        super().__init__(root)
+        self.limit = limit
+
+    def open(self, path, mode="r"):
+        f = super().open(path, mode)
+        if not path.endswith(".part"):
+            return f
+        limit, write = self.limit, f.write
+
+        def partial_write(data):
+            write(data[:limit])
+            f.flush()
+            raise _Interrupted()
+
+        f.write = partial_write
+        return f
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "out" / "Mobile_Dental_Event_2025-08-12.csv"
+    path.parent.mkdir()
+    path.write_bytes(b"personID,dob\n" + b"".join(b"%d,19850312\n" % i for i in range(5000)))
+    return str(path)
+
+
+def _remote(tmp_path, name):
+    return tmp_path / "remote" / "drop" / name
+
+
+def test_fresh_upload_writes_file_and_manifest(tmp_path, csv_path):
+    client = LocalSFTPClient(str(tmp_path / "remote"))
+    client.mkdir("drop")
+    name = os.path.basename(csv_path)
+
+    assert upload_file(client, csv_path, "drop") == "uploaded"
+    assert _remote(tmp_path, name).read_bytes() == open(csv_path, "rb").read()
+    assert _remote(tmp_path, name + ".sha256").read_text().endswith(f"  {name}\n")
+    assert not _remote(tmp_path, name + ".part").exists()
+    assert not _remote(tmp_path, name + ".part.sha256").exists()
+
+
+def test_matching_manifest_is_skipped(tmp_path, csv_path):
+    client = LocalSFTPClient(str(tmp_path / "remote"))
+    client.mkdir("drop")
+    upload_file(client, csv_path, "drop")
+
+    assert upload_file(client, csv_path, "drop") == "skipped"
+    with open(csv_path, "ab") as f:
+        f.write(b"5000,19850312\n")
+    assert upload_file(client, csv_path, "drop") == "uploaded"
+
+
+def test_truncated_part_is_resumed(tmp_path, csv_path):
+    root = str(tmp_path / "remote")
+    LocalSFTPClient(root).mkdir("drop")
+    name = os.path.basename(csv_path)
+    with pytest.raises(_Interrupted):
+        upload_file(_DroppingClient(root, 1000), csv_path, "drop")
+    assert _remote(tmp_path, name + ".part").stat().st_size == 1000
+
+    assert upload_file(LocalSFTPClient(root), csv_path, "drop") == "resumed"
+    assert _remote(tmp_path, name).read_bytes() == open(csv_path, "rb").read()
+
+
+def test_part_of_a_different_file_starts_over(tmp_path, csv_path):
+    root = str(tmp_path / "remote")
+    LocalSFTPClient(root).mkdir("drop")
+    with pytest.raises(_Interrupted):
+        upload_file(_DroppingClient(root, 1000), csv_path, "drop")
+    with open(csv_path, "r+b") as f:
+        f.write(b"changed")
+
+    assert upload_file(LocalSFTPClient(root), csv_path, "drop") == "uploaded"
+    assert _remote(tmp_path, os.path.basename(csv_path)).read_bytes() == open(csv_path, "rb").read()
+
+
+def test_compressed_upload_sends_gzip_and_reports_by_csv(tmp_path, csv_path):
+    root = str(tmp_path / "remote")
+    connect = lambda: LocalSFTPClient(root)
+
+    results = upload_outreach([csv_path], remote_dir="drop", compress=True, connect=connect, workers=2)
+
+    assert results == {csv_path: "uploaded"}
+    sent = _remote(tmp_path, os.path.basename(csv_path) + ".gz")
+    assert gzip.decompress(sent.read_bytes()) == open(csv_path, "rb").read()
+    # Deterministic gzip: the same CSV bundles to the same bytes, so a re-run skips it
+    assert upload_outreach([csv_path], remote_dir="drop", compress=True, connect=connect) == {csv_path: "skipped"}